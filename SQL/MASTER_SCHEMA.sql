@@ -8,6 +8,7 @@
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- =============================================================================
 -- CORE TABLES
@@ -69,6 +70,7 @@ CREATE TABLE students (
     grade INTEGER,
     email VARCHAR(255),
     is_active BOOLEAN DEFAULT true,
+    name_key TEXT GENERATED ALWAYS AS (lower(btrim(full_name))) STORED,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -76,6 +78,9 @@ CREATE TABLE students (
 CREATE INDEX idx_students_name ON students(full_name);
 CREATE INDEX idx_students_grade ON students(grade);
 CREATE INDEX idx_students_active ON students(is_active);
+CREATE INDEX idx_students_active_grade ON students(grade) WHERE is_active = true;
+-- one student per normalized name and grade; csv imports upsert against this
+CREATE UNIQUE INDEX uq_students_name_key_grade ON students(name_key, grade) NULLS NOT DISTINCT;
 
 -- WEEKS TABLE
 CREATE TABLE weeks (
@@ -87,6 +92,7 @@ CREATE TABLE weeks (
     date DATE,
     is_partial BOOLEAN DEFAULT false,
     notes TEXT,
+    selection_seed BIGINT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_session FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
@@ -191,6 +197,22 @@ CREATE INDEX idx_speaker_status_session_id ON session_speaker_status(session_id)
 CREATE INDEX idx_speaker_status_student_id ON session_speaker_status(student_id);
 CREATE INDEX idx_speaker_status_has_spoken ON session_speaker_status(has_spoken);
 
+-- SPEAKER ROTATION SLOTS TABLE
+-- precomputed extempore schedule, one row per planned week
+CREATE TABLE speaker_rotation_slots (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    session_id UUID NOT NULL,
+    week_number INTEGER NOT NULL,
+    student_ids UUID[] NOT NULL,
+    grade_filter INTEGER,
+    cycle INTEGER NOT NULL DEFAULT 1,
+    is_partial BOOLEAN DEFAULT false,
+    seed BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_session_rotation FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+    CONSTRAINT unique_session_rotation_week UNIQUE (session_id, week_number)
+);
+
 -- =============================================================================
 -- JUDGING SYSTEM TABLES
 -- =============================================================================
@@ -231,13 +253,37 @@ CREATE TABLE judge_scores (
 CREATE INDEX idx_judge_scores_participant_id ON judge_scores(participant_id);
 CREATE INDEX idx_judge_scores_judge_email ON judge_scores(judge_email);
 
+-- =============================================================================
+-- SESSION LEADERBOARD
+-- =============================================================================
+
+-- SESSION LEADERBOARD TABLE
+-- cumulative standings per session, maintained by triggers below
+CREATE TABLE session_leaderboard (
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    student_id UUID NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    total_score DECIMAL(8,2) NOT NULL DEFAULT 0,
+    scores_count INTEGER NOT NULL DEFAULT 0,
+    weeks_participated INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    first_places INTEGER NOT NULL DEFAULT 0,
+    best_position INTEGER,
+    average_position DECIMAL(6,2),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, student_id)
+);
+
+CREATE INDEX idx_session_leaderboard_total ON session_leaderboard(session_id, total_score DESC);
+
 -- =============================================================================
 -- AUDIT LOGGING TABLE
 -- =============================================================================
 
 -- AUDIT LOGS TABLE
+-- range-partitioned by month on created_at so old months can be archived and
+-- dropped whole (see utils/audit_retention.py); the key has to include created_at
 CREATE TABLE audit_logs (
-    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    id UUID DEFAULT gen_random_uuid(),
     admin_email VARCHAR(255) NOT NULL,
     admin_id UUID,
     action_type VARCHAR(50) NOT NULL,
@@ -247,13 +293,21 @@ CREATE TABLE audit_logs (
     old_value JSONB,
     new_value JSONB,
     description TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-
-CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at DESC);
-CREATE INDEX idx_audit_logs_admin_email ON audit_logs(admin_email);
-CREATE INDEX idx_audit_logs_entity_type ON audit_logs(entity_type);
-CREATE INDEX idx_audit_logs_action_type ON audit_logs(action_type);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- catches rows outside every monthly partition, e.g. if partitions weren't created ahead
+CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+ALTER TABLE audit_logs_default ENABLE ROW LEVEL SECURITY;
+
+-- the logs page pages newest first on (created_at, id)
+CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at DESC, id DESC);
+-- substring email search (ilike '%...%')
+CREATE INDEX idx_audit_logs_admin_email ON audit_logs USING gin (admin_email gin_trgm_ops);
+CREATE INDEX idx_audit_logs_entity_type ON audit_logs(entity_type, created_at DESC);
+CREATE INDEX idx_audit_logs_action_type ON audit_logs(action_type, created_at DESC);
+CREATE INDEX idx_audit_logs_entity_id ON audit_logs(entity_id) WHERE entity_id IS NOT NULL;
 
 -- =============================================================================
 -- FUNCTIONS AND TRIGGERS
@@ -290,6 +344,338 @@ CREATE TRIGGER update_participants_updated_at BEFORE UPDATE ON participants
 CREATE TRIGGER update_speaker_status_updated_at BEFORE UPDATE ON session_speaker_status
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Candidate ids for extempore random selection
+-- active students (optionally one grade) who haven't spoken in the session yet
+-- returned as one array so PostgREST row limits never truncate the roster
+CREATE OR REPLACE FUNCTION get_available_speakers(p_session_id UUID, p_grade INTEGER DEFAULT NULL)
+RETURNS UUID[] AS $$
+    SELECT COALESCE(array_agg(s.id ORDER BY s.id), '{}')
+    FROM students s
+    WHERE s.is_active = true
+    AND (p_grade IS NULL OR s.grade = p_grade)
+    AND NOT EXISTS (
+        SELECT 1 FROM session_speaker_status sss
+        WHERE sss.session_id = p_session_id
+        AND sss.student_id = s.id
+        AND sss.has_spoken = true
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Active roster (id, grade, has_spoken) for planning a rotation
+-- has_spoken is from p_session_id's speaker status, so a plan made mid-cycle
+-- starts with the students who haven't spoken yet
+-- one JSON array, so PostgREST row limits never truncate a large roster
+CREATE OR REPLACE FUNCTION get_active_student_roster(p_session_id UUID DEFAULT NULL)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'id', s.id,
+        'grade', s.grade,
+        'has_spoken', EXISTS (
+            SELECT 1 FROM session_speaker_status sss
+            WHERE sss.session_id = p_session_id
+            AND sss.student_id = s.id
+            AND sss.has_spoken = true
+        )
+    ) ORDER BY s.id), '[]'::jsonb)
+    FROM students s
+    WHERE s.is_active = true;
+$$ LANGUAGE sql STABLE;
+
+-- Swap a session's rotation plan for a new one in one transaction
+-- p_slots is [{week_number, student_ids, grade_filter, cycle, is_partial}]
+CREATE OR REPLACE FUNCTION replace_rotation_plan(p_session_id UUID, p_seed BIGINT, p_slots JSONB)
+RETURNS SETOF speaker_rotation_slots AS $$
+    DELETE FROM speaker_rotation_slots WHERE session_id = p_session_id;
+
+    INSERT INTO speaker_rotation_slots (session_id, week_number, student_ids, grade_filter, cycle, is_partial, seed)
+    SELECT p_session_id, s.week_number, s.student_ids, s.grade_filter, s.cycle, s.is_partial, p_seed
+    FROM jsonb_to_recordset(p_slots) AS s(
+        week_number INTEGER,
+        student_ids UUID[],
+        grade_filter INTEGER,
+        cycle INTEGER,
+        is_partial BOOLEAN
+    )
+    ORDER BY s.week_number
+    RETURNING *;
+$$ LANGUAGE sql;
+
+REVOKE EXECUTE ON FUNCTION replace_rotation_plan(UUID, BIGINT, JSONB) FROM PUBLIC, anon, authenticated;
+
+-- Apply per-student changes in one statement
+-- p_changes is [{id, grade?, is_active?, email?}]; a key that's left out keeps its value,
+-- so e.g. a promotion sends each student's new grade and nothing else
+CREATE OR REPLACE FUNCTION update_students_batch(p_changes JSONB)
+RETURNS SETOF students AS $$
+    UPDATE students s
+    SET grade = CASE WHEN c.change ? 'grade' THEN (c.change->>'grade')::INTEGER ELSE s.grade END,
+        is_active = CASE WHEN c.change ? 'is_active' THEN (c.change->>'is_active')::BOOLEAN ELSE s.is_active END,
+        email = CASE WHEN c.change ? 'email' THEN c.change->>'email' ELSE s.email END
+    FROM jsonb_array_elements(p_changes) AS c(change)
+    WHERE s.id = (c.change->>'id')::UUID
+    RETURNING s.*;
+$$ LANGUAGE sql;
+
+-- Delete a list of students in one statement
+-- the ids travel in the request body, a long list would overflow a query string
+CREATE OR REPLACE FUNCTION delete_students_batch(p_student_ids UUID[])
+RETURNS SETOF students AS $$
+    DELETE FROM students
+    WHERE id = ANY(p_student_ids)
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- student batches are for the service key only
+REVOKE EXECUTE ON FUNCTION update_students_batch(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION delete_students_batch(UUID[]) FROM PUBLIC, anon, authenticated;
+
+-- Live standings for a week; the one place the ranking rule lives
+-- admin results, public rankings (utils/score_aggregator.py) and publishing all read it:
+-- all scores summed, dense rank for position, and only scored participants whose
+-- competition rank is within the top 3 win (ties share, so a tie can't pull extra
+-- places into the top 3)
+CREATE OR REPLACE FUNCTION get_week_standings(p_week_id UUID)
+RETURNS TABLE (
+    participant_id UUID,
+    total_score DECIMAL,
+    rank INTEGER,
+    is_winner BOOLEAN
+) AS $$
+    WITH totals AS (
+        SELECT p.id, COALESCE(SUM(js.score), 0) AS total, COUNT(js.id) AS scores_count
+        FROM participants p
+        LEFT JOIN judge_scores js ON js.participant_id = p.id
+        WHERE p.week_id = p_week_id
+        GROUP BY p.id
+    )
+    SELECT t.id,
+        t.total,
+        DENSE_RANK() OVER (ORDER BY t.total DESC)::INTEGER,
+        t.scores_count > 0 AND RANK() OVER (ORDER BY t.total DESC) <= 3
+    FROM totals t
+    JOIN participants p ON p.id = t.id
+    JOIN students st ON st.id = p.student_id
+    ORDER BY t.total DESC, st.full_name, t.id;
+$$ LANGUAGE sql STABLE;
+
+-- Publish a week's results in one atomic statement
+-- the total is stored on the participant too, the public winners list shows it
+CREATE OR REPLACE FUNCTION publish_week_results(p_week_id UUID)
+RETURNS TABLE (
+    participant_id UUID,
+    student_id UUID,
+    total_score DECIMAL,
+    position INTEGER,
+    is_winner BOOLEAN
+) AS $$
+    WITH updated AS (
+        UPDATE participants p
+        SET position = ws.rank,
+            is_winner = ws.is_winner,
+            score = ws.total_score
+        FROM get_week_standings(p_week_id) ws
+        WHERE p.id = ws.participant_id
+        RETURNING p.id, p.student_id, ws.total_score, p.position, p.is_winner
+    )
+    SELECT * FROM updated ORDER BY position;
+$$ LANGUAGE sql;
+
+-- Session leaderboard maintenance
+-- scores are applied as deltas, placings are recounted for the one student touched
+-- a recount locks the student's leaderboard row before it reads any scores, and
+-- deltas are applied under the same lock, so the two can't overwrite each other
+
+-- Recount placings for one student in one session (optionally ignoring a week being deleted)
+CREATE OR REPLACE FUNCTION refresh_leaderboard_placings(
+    p_session_id UUID,
+    p_student_id UUID,
+    p_excluded_week_id UUID DEFAULT NULL
+)
+RETURNS VOID AS $$
+BEGIN
+    -- lock the row first (creating it if needed): a concurrent score delta either
+    -- committed before this, and the recount below sees its score, or waits and
+    -- is added on top of the recount afterwards
+    INSERT INTO session_leaderboard (session_id, student_id)
+    VALUES (p_session_id, p_student_id)
+    ON CONFLICT (session_id, student_id) DO NOTHING;
+
+    PERFORM 1 FROM session_leaderboard
+    WHERE session_id = p_session_id
+    AND student_id = p_student_id
+    FOR UPDATE;
+
+    INSERT INTO session_leaderboard AS lb (
+        session_id, student_id, total_score, scores_count,
+        weeks_participated, wins, first_places, best_position, average_position
+    )
+    SELECT
+        p_session_id,
+        p_student_id,
+        COALESCE((
+            SELECT SUM(js.score)
+            FROM judge_scores js
+            JOIN participants p2 ON p2.id = js.participant_id
+            JOIN weeks w2 ON w2.id = p2.week_id
+            WHERE w2.session_id = p_session_id
+            AND p2.student_id = p_student_id
+            AND w2.id IS DISTINCT FROM p_excluded_week_id
+        ), 0),
+        (
+            SELECT COUNT(*)
+            FROM judge_scores js
+            JOIN participants p2 ON p2.id = js.participant_id
+            JOIN weeks w2 ON w2.id = p2.week_id
+            WHERE w2.session_id = p_session_id
+            AND p2.student_id = p_student_id
+            AND w2.id IS DISTINCT FROM p_excluded_week_id
+        ),
+        COUNT(p.id),
+        COUNT(p.id) FILTER (WHERE p.is_winner),
+        COUNT(p.id) FILTER (WHERE p.position = 1),
+        MIN(p.position),
+        ROUND(AVG(p.position), 2)
+    FROM participants p
+    JOIN weeks w ON w.id = p.week_id
+    WHERE w.session_id = p_session_id
+    AND p.student_id = p_student_id
+    AND w.id IS DISTINCT FROM p_excluded_week_id
+    ON CONFLICT (session_id, student_id) DO UPDATE SET
+        total_score = EXCLUDED.total_score,
+        scores_count = EXCLUDED.scores_count,
+        weeks_participated = EXCLUDED.weeks_participated,
+        wins = EXCLUDED.wins,
+        first_places = EXCLUDED.first_places,
+        best_position = EXCLUDED.best_position,
+        average_position = EXCLUDED.average_position,
+        updated_at = CURRENT_TIMESTAMP;
+
+    -- students with no weeks left drop off the board
+    DELETE FROM session_leaderboard
+    WHERE session_id = p_session_id
+    AND student_id = p_student_id
+    AND weeks_participated = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply a judge score change as a delta
+CREATE OR REPLACE FUNCTION apply_score_to_leaderboard()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_participant_id UUID;
+    v_session_id UUID;
+    v_student_id UUID;
+    v_delta DECIMAL(8,2) := 0;
+    v_count_delta INTEGER := 0;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_participant_id := OLD.participant_id;
+    ELSE
+        v_participant_id := NEW.participant_id;
+    END IF;
+
+    -- participant already gone: its delete trigger recounts instead
+    SELECT w.session_id, p.student_id INTO v_session_id, v_student_id
+    FROM participants p
+    JOIN weeks w ON w.id = p.week_id
+    WHERE p.id = v_participant_id;
+
+    IF v_session_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_delta := v_delta + NEW.score;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_delta := v_delta - OLD.score;
+    END IF;
+    v_count_delta := CASE TG_OP WHEN 'INSERT' THEN 1 WHEN 'DELETE' THEN -1 ELSE 0 END;
+
+    INSERT INTO session_leaderboard AS lb (session_id, student_id, total_score, scores_count)
+    VALUES (v_session_id, v_student_id, v_delta, GREATEST(v_count_delta, 0))
+    ON CONFLICT (session_id, student_id) DO UPDATE SET
+        total_score = lb.total_score + v_delta,
+        scores_count = lb.scores_count + v_count_delta,
+        updated_at = CURRENT_TIMESTAMP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recount placings when a participant is added, ranked or removed
+CREATE OR REPLACE FUNCTION apply_participant_to_leaderboard()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_row participants%ROWTYPE;
+    v_session_id UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_row := OLD;
+    ELSE
+        v_row := NEW;
+    END IF;
+
+    -- week already gone: its delete trigger handled the recount
+    SELECT session_id INTO v_session_id FROM weeks WHERE id = v_row.week_id;
+
+    IF v_session_id IS NOT NULL THEN
+        PERFORM refresh_leaderboard_placings(v_session_id, v_row.student_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Recount everyone in a week before the week and its participants are deleted
+CREATE OR REPLACE FUNCTION remove_week_from_leaderboard()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_student_id UUID;
+BEGIN
+    FOR v_student_id IN SELECT student_id FROM participants WHERE week_id = OLD.id LOOP
+        PERFORM refresh_leaderboard_placings(OLD.session_id, v_student_id, OLD.id);
+    END LOOP;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Backfill or repair a whole session
+CREATE OR REPLACE FUNCTION rebuild_session_leaderboard(p_session_id UUID)
+RETURNS VOID AS $$
+DECLARE
+    v_student_id UUID;
+BEGIN
+    DELETE FROM session_leaderboard WHERE session_id = p_session_id;
+
+    FOR v_student_id IN
+        SELECT DISTINCT p.student_id
+        FROM participants p
+        JOIN weeks w ON w.id = p.week_id
+        WHERE w.session_id = p_session_id
+    LOOP
+        PERFORM refresh_leaderboard_placings(p_session_id, v_student_id);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ranking, publishing and leaderboard rebuilds are for the service key only;
+-- the leaderboard triggers run as the owner, so they still work for any writer
+REVOKE EXECUTE ON FUNCTION get_week_standings(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION publish_week_results(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION refresh_leaderboard_placings(UUID, UUID, UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION rebuild_session_leaderboard(UUID) FROM PUBLIC, anon, authenticated;
+
+CREATE TRIGGER judge_scores_leaderboard AFTER INSERT OR UPDATE OF score OR DELETE ON judge_scores
+    FOR EACH ROW EXECUTE FUNCTION apply_score_to_leaderboard();
+
+CREATE TRIGGER participants_leaderboard AFTER INSERT OR UPDATE OF is_winner, position OR DELETE ON participants
+    FOR EACH ROW EXECUTE FUNCTION apply_participant_to_leaderboard();
+
+CREATE TRIGGER weeks_leaderboard BEFORE DELETE ON weeks
+    FOR EACH ROW EXECUTE FUNCTION remove_week_from_leaderboard();
+
 -- =============================================================================
 -- ROW LEVEL SECURITY (RLS)
 -- =============================================================================
@@ -306,9 +692,11 @@ ALTER TABLE week_judges ENABLE ROW LEVEL SECURITY;
 ALTER TABLE week_criteria ENABLE ROW LEVEL SECURITY;
 ALTER TABLE participants ENABLE ROW LEVEL SECURITY;
 ALTER TABLE session_speaker_status ENABLE ROW LEVEL SECURITY;
+ALTER TABLE speaker_rotation_slots ENABLE ROW LEVEL SECURITY;
 ALTER TABLE judge_permissions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE judge_scores ENABLE ROW LEVEL SECURITY;
 ALTER TABLE audit_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE session_leaderboard ENABLE ROW LEVEL SECURITY;
 
 -- Public read access policies
 CREATE POLICY "Events are viewable by everyone" ON events FOR SELECT USING (true);
@@ -321,6 +709,7 @@ CREATE POLICY "Judges are viewable by everyone" ON judges FOR SELECT USING (true
 CREATE POLICY "Week judges are viewable by everyone" ON week_judges FOR SELECT USING (true);
 CREATE POLICY "Week criteria are viewable by everyone" ON week_criteria FOR SELECT USING (true);
 CREATE POLICY "Speaker status is viewable by everyone" ON session_speaker_status FOR SELECT USING (true);
+CREATE POLICY "Leaderboard is viewable by everyone" ON session_leaderboard FOR SELECT USING (true);
 
 -- Admin-only write access policies
 CREATE POLICY "Admins can do everything on events" ON events FOR ALL USING (true);
@@ -333,6 +722,7 @@ CREATE POLICY "Admins can do everything on week_judges" ON week_judges FOR ALL U
 CREATE POLICY "Admins can do everything on week_criteria" ON week_criteria FOR ALL USING (true);
 CREATE POLICY "Admins can do everything on participants" ON participants FOR ALL USING (true);
 CREATE POLICY "Admins can do everything on speaker_status" ON session_speaker_status FOR ALL USING (true);
+CREATE POLICY "Admins can do everything on rotation slots" ON speaker_rotation_slots FOR ALL USING (true);
 
 -- Judge permissions policies
 CREATE POLICY "Admins can manage judge permissions"
@@ -412,11 +802,104 @@ ON audit_logs FOR INSERT
 TO authenticated
 WITH CHECK (true);
 
+-- =============================================================================
+-- AUDIT LOG PARTITIONS
+-- =============================================================================
+
+-- Create the monthly partition holding p_month, if it doesn't exist yet
+-- partitions are named audit_logs_yYYYYmMM and get RLS with no policies, so they
+-- can't be read directly through the API except with the service key
+-- security definer because partition DDL needs the table owner
+CREATE OR REPLACE FUNCTION create_audit_log_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::DATE;
+    v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name TEXT := 'audit_logs_' || to_char(v_start, '"y"YYYY"m"MM');
+BEGIN
+    IF to_regclass(v_name) IS NULL THEN
+        IF EXISTS (
+            SELECT 1 FROM audit_logs_default
+            WHERE created_at >= v_start AND created_at < v_end
+        ) THEN
+            -- rows for this month already landed in the default partition (partitions
+            -- weren't created ahead), and postgres refuses a new partition that
+            -- overlaps them; move them across with the default detached
+            -- (inserts wait on the parent's lock meanwhile)
+            ALTER TABLE audit_logs DETACH PARTITION audit_logs_default;
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_start, v_end
+            );
+            EXECUTE format(
+                'INSERT INTO %I SELECT * FROM audit_logs_default WHERE created_at >= %L AND created_at < %L',
+                v_name, v_start, v_end
+            );
+            DELETE FROM audit_logs_default WHERE created_at >= v_start AND created_at < v_end;
+            ALTER TABLE audit_logs ATTACH PARTITION audit_logs_default DEFAULT;
+        ELSE
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_start, v_end
+            );
+        END IF;
+        EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', v_name);
+    END IF;
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Make sure this month and the next p_months_ahead months have partitions
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(p_months_ahead INTEGER DEFAULT 3)
+RETURNS SETOF TEXT AS $$
+    SELECT create_audit_log_partition((date_trunc('month', NOW()) + make_interval(months => m))::DATE)
+    FROM generate_series(0, p_months_ahead) AS m;
+$$ LANGUAGE sql;
+
+-- Monthly partitions with their bounds, oldest first (the default partition isn't listed)
+CREATE OR REPLACE FUNCTION list_audit_log_partitions()
+RETURNS TABLE (partition_name TEXT, range_start TIMESTAMPTZ, range_end TIMESTAMPTZ) AS $$
+    SELECT
+        c.relname::TEXT,
+        (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \(''([^'']+)''\)'))[1]::TIMESTAMPTZ,
+        (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::TIMESTAMPTZ
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'audit_logs'::regclass
+    AND NOT pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'
+    ORDER BY 2;
+$$ LANGUAGE sql STABLE;
+
+-- Detach and drop one archived monthly partition
+-- only partitions of audit_logs are accepted, so this can't drop anything else
+CREATE OR REPLACE FUNCTION drop_audit_log_partition(p_partition_name TEXT)
+RETURNS VOID AS $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM list_audit_log_partitions() WHERE partition_name = p_partition_name
+    ) THEN
+        RAISE EXCEPTION '% is not a monthly audit_logs partition', p_partition_name;
+    END IF;
+    
+    EXECUTE format('ALTER TABLE audit_logs DETACH PARTITION %I', p_partition_name);
+    EXECUTE format('DROP TABLE %I', p_partition_name);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- retention functions are for the service key only
+REVOKE EXECUTE ON FUNCTION create_audit_log_partition(DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION ensure_audit_log_partitions(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION list_audit_log_partitions() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_audit_log_partition(TEXT) FROM PUBLIC, anon, authenticated;
+
+SELECT ensure_audit_log_partitions(3);
+
 -- =============================================================================
 -- VIEWS
 -- =============================================================================
 
 -- View for recent winners (exposes session_language for per-language filtering)
+-- /api/winners pages through this view on (sort_date, week_id, position)
 CREATE OR REPLACE VIEW recent_winners AS
 SELECT
     p.id,
@@ -432,7 +915,10 @@ SELECT
     sess.session_number,
     sess.language   AS session_language,
     e.name          AS event_name,
-    e.name_nepali   AS event_name_nepali
+    e.name_nepali   AS event_name_nepali,
+    e.id            AS event_id,
+    -- undated weeks sort by creation day so keyset pagination never sees NULL
+    COALESCE(w.date, w.created_at::date) AS sort_date
 FROM participants p
 JOIN students s    ON p.student_id  = s.id
 JOIN weeks w       ON p.week_id     = w.id
@@ -499,10 +985,15 @@ COMMENT ON TABLE judges IS 'Judges who evaluate participants';
 COMMENT ON TABLE judging_criteria IS 'Criteria used for judging';
 COMMENT ON TABLE participants IS 'Students participating in specific weeks';
 COMMENT ON TABLE session_speaker_status IS 'Tracks who has spoken in extempore sessions';
+COMMENT ON TABLE speaker_rotation_slots IS 'Planned extempore speakers for each week of a session';
 COMMENT ON TABLE judge_permissions IS 'Temporary judging permissions for non-admin users';
 COMMENT ON TABLE judge_scores IS 'Detailed scores from each judge by category';
 COMMENT ON TABLE audit_logs IS 'Stores audit trail of all admin actions';
+COMMENT ON TABLE audit_logs_default IS 'Audit rows that fall outside every monthly partition';
+COMMENT ON TABLE session_leaderboard IS 'Cumulative standings per session, kept current by triggers on judge_scores, participants and weeks';
 
+COMMENT ON COLUMN students.name_key IS 'Normalized full_name used with grade to reject duplicate students';
+COMMENT ON COLUMN weeks.selection_seed IS 'RNG seed of the random draw made when the week was created; every draw, including later additions, has its seed in its SELECT audit entry';
 COMMENT ON COLUMN participants.position IS 'Rank/position of participant in their week (1 = first place, 2 = second, etc.)';
 COMMENT ON COLUMN judge_permissions.judge_type IS 'Type of judging: overall, content, style_delivery, language, etc.';
 COMMENT ON COLUMN judge_scores.criteria_breakdown IS 'JSON breakdown of scores per criteria';
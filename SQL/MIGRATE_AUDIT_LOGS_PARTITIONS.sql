@@ -0,0 +1,122 @@
+-- =============================================================================
+-- DSS TALK - MIGRATE audit_logs TO MONTHLY PARTITIONS
+-- =============================================================================
+-- For databases created before audit_logs was partitioned. MASTER_SCHEMA.sql
+-- already creates the partitioned table, so fresh installs don't need this.
+--
+-- 1. Stop the app (queued audit entries are spooled and replayed later)
+-- 2. Run this file
+-- 3. Run the AUDIT LOG PARTITIONS section of MASTER_SCHEMA.sql, which adds the
+--    partition functions and creates the upcoming months
+-- 4. Start the app, check the logs page, then drop audit_logs_unpartitioned
+-- =============================================================================
+
+BEGIN;
+
+-- the email search index needs trigram support
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- keep the old table aside; its indexes and primary key keep their names, so
+-- drop or rename them to make room
+ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned;
+ALTER TABLE audit_logs_unpartitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_unpartitioned_pkey;
+
+DROP INDEX IF EXISTS idx_audit_logs_created_at;
+DROP INDEX IF EXISTS idx_audit_logs_admin_email;
+DROP INDEX IF EXISTS idx_audit_logs_entity_type;
+DROP INDEX IF EXISTS idx_audit_logs_action_type;
+DROP INDEX IF EXISTS idx_audit_logs_entity_id;
+
+-- same definition as MASTER_SCHEMA.sql
+CREATE TABLE audit_logs (
+    id UUID DEFAULT gen_random_uuid(),
+    admin_email VARCHAR(255) NOT NULL,
+    admin_id UUID,
+    action_type VARCHAR(50) NOT NULL,
+    entity_type VARCHAR(50) NOT NULL,
+    entity_id UUID,
+    entity_name VARCHAR(255),
+    old_value JSONB,
+    new_value JSONB,
+    description TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+ALTER TABLE audit_logs_default ENABLE ROW LEVEL SECURITY;
+
+-- one partition per month already in the old table, named like create_audit_log_partition does
+DO $$
+DECLARE
+    v_start DATE;
+    v_name TEXT;
+BEGIN
+    FOR v_start IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE
+        FROM audit_logs_unpartitioned
+        WHERE created_at IS NOT NULL
+    LOOP
+        v_name := 'audit_logs_' || to_char(v_start, '"y"YYYY"m"MM');
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+            v_name, v_start, (v_start + INTERVAL '1 month')::DATE
+        );
+        EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', v_name);
+    END LOOP;
+END;
+$$;
+
+-- created_at is NOT NULL now; rows that never had one are stamped with the migration time
+INSERT INTO audit_logs (
+    id, admin_email, admin_id, action_type, entity_type, entity_id,
+    entity_name, old_value, new_value, description, created_at
+)
+SELECT
+    id, admin_email, admin_id, action_type, entity_type, entity_id,
+    entity_name, old_value, new_value, description, COALESCE(created_at, NOW())
+FROM audit_logs_unpartitioned;
+
+DO $$
+BEGIN
+    IF (SELECT COUNT(*) FROM audit_logs) <> (SELECT COUNT(*) FROM audit_logs_unpartitioned) THEN
+        RAISE EXCEPTION 'audit_logs row counts differ after the copy, rolling back';
+    END IF;
+END;
+$$;
+
+CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at DESC, id DESC);
+CREATE INDEX idx_audit_logs_admin_email ON audit_logs USING gin (admin_email gin_trgm_ops);
+CREATE INDEX idx_audit_logs_entity_type ON audit_logs(entity_type, created_at DESC);
+CREATE INDEX idx_audit_logs_action_type ON audit_logs(action_type, created_at DESC);
+CREATE INDEX idx_audit_logs_entity_id ON audit_logs(entity_id) WHERE entity_id IS NOT NULL;
+
+-- policies stay with the old table, so recreate them
+ALTER TABLE audit_logs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Admins can view all audit logs"
+ON audit_logs FOR SELECT
+TO authenticated
+USING (
+    EXISTS (
+        SELECT 1 FROM admins
+        WHERE admins.user_id = auth.uid()
+    )
+);
+
+CREATE POLICY "Allow insert for authenticated users"
+ON audit_logs FOR INSERT
+TO authenticated
+WITH CHECK (true);
+
+COMMENT ON TABLE audit_logs IS 'Stores audit trail of all admin actions';
+COMMENT ON TABLE audit_logs_default IS 'Audit rows that fall outside every monthly partition';
+COMMENT ON COLUMN audit_logs.action_type IS 'Type of action: CREATE, UPDATE, DELETE, etc.';
+COMMENT ON COLUMN audit_logs.entity_type IS 'Type of entity: week, session, student, participant, etc.';
+COMMENT ON COLUMN audit_logs.old_value IS 'JSON snapshot of entity before change';
+COMMENT ON COLUMN audit_logs.new_value IS 'JSON snapshot of entity after change';
+
+COMMIT;
+
+-- once the logs page looks right:
+-- DROP TABLE audit_logs_unpartitioned;
@@ -13,6 +13,56 @@ class Config:
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
     
+    # token verification
+    # legacy HS256 projects sign with the JWT secret, newer ones publish a JWKS
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+    JWKS_CACHE_TTL = int(os.getenv('JWKS_CACHE_TTL', 600))
+    # tokens this close to expiry get checked against the auth server
+    JWT_EXPIRY_MARGIN = int(os.getenv('JWT_EXPIRY_MARGIN', 30))
+    
+    # admin membership cache, in seconds (0 disables)
+    ADMIN_CACHE_TTL = int(os.getenv('ADMIN_CACHE_TTL', 300))
+    # non-admins are re-checked sooner so new admins get in quickly
+    ADMIN_NEGATIVE_CACHE_TTL = int(os.getenv('ADMIN_NEGATIVE_CACHE_TTL', 60))
+    
+    # judge permission index, in seconds
+    # bounds how long other workers take to see grants and revocations
+    JUDGE_PERMISSION_CACHE_TTL = int(os.getenv('JUDGE_PERMISSION_CACHE_TTL', 60))
+    # participant -> week lookups used when scoring
+    PARTICIPANT_WEEK_CACHE_TTL = int(os.getenv('PARTICIPANT_WEEK_CACHE_TTL', 600))
+    
+    # public read endpoint cache, in seconds
+    # the server copy is dropped on publish, the ttl only covers other workers
+    PUBLIC_CACHE_TTL = int(os.getenv('PUBLIC_CACHE_TTL', 60))
+    # browsers revalidate with the etag after this
+    PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', 0))
+    # most responses kept in memory, least recently used go first
+    PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv('PUBLIC_CACHE_MAX_ENTRIES', 512))
+    
+    # concurrent query fan-out
+    FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', 8))
+    FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', 10))
+    
+    # most students one batch create/update/delete request may touch
+    STUDENT_BATCH_MAX_SIZE = int(os.getenv('STUDENT_BATCH_MAX_SIZE', 1000))
+    
+    # rows per insert when streaming a csv upload
+    CSV_IMPORT_CHUNK_SIZE = int(os.getenv('CSV_IMPORT_CHUNK_SIZE', 500))
+    
+    # audit log writer: entries are batched and flushed by a background thread
+    AUDIT_FLUSH_SIZE = int(os.getenv('AUDIT_FLUSH_SIZE', 50))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))
+    # append-only jsonl file for entries that couldn't be written, replayed later
+    AUDIT_SPOOL_PATH = os.getenv('AUDIT_SPOOL_PATH', 'audit_spool.jsonl')
+    # entries the database rejected outright (bad data), kept for inspection, never retried
+    AUDIT_DEAD_LETTER_PATH = os.getenv('AUDIT_DEAD_LETTER_PATH', 'audit_dead_letter.jsonl')
+    
+    # audit log retention, see utils/audit_retention.py
+    AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', 24))
+    AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', 'audit_archive')
+    # the logs page reads this many recent days unless asked for more
+    AUDIT_QUERY_WINDOW_DAYS = int(os.getenv('AUDIT_QUERY_WINDOW_DAYS', 90))
+    
     # app
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'csv'}
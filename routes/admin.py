@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from supabase import create_client
 from config import Config
-from utils.auth import require_admin
+from utils.auth import require_admin, get_current_identity, invalidate_admin_cache
 from utils.csv_handler import CSVStudentImporter
 from utils.random_selector import ExtemporeRandomSelector
 from utils.audit_logger import AuditLogger
+from utils.judge_permissions import judge_permission_index
+from utils.http_cache import bump_publish_version
+from utils.fanout import fan_out
+from utils.score_aggregator import load_week_standings
+from utils.cursors import InvalidCursor, parse_cursor, parse_limit, parse_timestamp
+from datetime import datetime, timedelta, timezone
+import codecs
+import csv
+import io
 import json
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -81,8 +90,189 @@ def delete_student(student_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# batch student api
+
+BATCH_UPDATABLE_FIELDS = ('grade', 'is_active', 'email')
+
+def _batch_student_ids(data):
+    # dedupe while keeping request order
+    return list(dict.fromkeys((data or {}).get('student_ids') or []))
+
+def _batch_too_large(count):
+    if count > Config.STUDENT_BATCH_MAX_SIZE:
+        return jsonify({'error': f'At most {Config.STUDENT_BATCH_MAX_SIZE} students per request'}), 400
+    return None
+
+def _valid_student_change(change):
+    grade = change.get('grade')
+    if 'grade' in change and grade is not None and (isinstance(grade, bool) or not isinstance(grade, int)):
+        return False
+    if 'is_active' in change and not isinstance(change['is_active'], bool):
+        return False
+    if 'email' in change and change['email'] is not None and not isinstance(change['email'], str):
+        return False
+    return True
+
+def _batch_student_changes(data):
+    # {students: [{id, grade, ...}]} carries each student's own changes (e.g. a
+    # promotion), {student_ids, updates} applies one set of changes to everyone
+    # returns (changes, error); a later entry for the same id wins
+    data = data or {}
+    if 'students' in data:
+        entries = data.get('students') or []
+    else:
+        updates = data.get('updates') or {}
+        entries = [dict(updates, id=student_id) for student_id in _batch_student_ids(data)]
+    
+    changes = {}
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get('id'):
+            return None, f'Change {index} has no student id'
+        change = {k: entry[k] for k in BATCH_UPDATABLE_FIELDS if k in entry}
+        if not change:
+            return None, f"Changes must include one of: {', '.join(BATCH_UPDATABLE_FIELDS)}"
+        if not _valid_student_change(change):
+            return None, f'Change {index} has an invalid value'
+        changes[entry['id']] = dict(change, id=entry['id'])
+    
+    return list(changes.values()), None
+
+@bp.route('/api/students/batch', methods=['POST'])
+@require_admin
+def create_students_batch():
+    try:
+        data = request.json
+        students = data.get('students') or []
+        
+        if not students:
+            return jsonify({'error': 'Students are required'}), 400
+        
+        too_large = _batch_too_large(len(students))
+        if too_large:
+            return too_large
+        
+        missing = [i for i, s in enumerate(students) if not (s.get('full_name') or '').strip()]
+        if missing:
+            return jsonify({'error': 'Student name is required', 'rows': missing}), 400
+        
+        records = [
+            {
+                'full_name': s['full_name'].strip(),
+                'grade': s.get('grade'),
+                'email': s.get('email'),
+                'is_active': s.get('is_active', True)
+            }
+            for s in students
+        ]
+        
+        # one insert; a duplicate or bad row rejects the whole batch
+        response = supabase.table('students').insert(records).execute()
+        
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='CREATE',
+            entity_type='student',
+            entity_name=f"{len(response.data)} students",
+            new_value={'student_ids': [s['id'] for s in response.data]},
+            description=f"Created {len(response.data)} students"
+        )
+        
+        return jsonify({'students': response.data}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/students/batch', methods=['PATCH'])
+@require_admin
+def update_students_batch():
+    # every student's changes applied in one statement, e.g. a whole-school
+    # promotion is one request with each student's new grade
+    try:
+        changes, error = _batch_student_changes(request.json)
+        
+        if error:
+            return jsonify({'error': error}), 400
+        if not changes:
+            return jsonify({'error': 'Student changes are required'}), 400
+        
+        too_large = _batch_too_large(len(changes))
+        if too_large:
+            return too_large
+        
+        response = supabase.rpc('update_students_batch', {'p_changes': changes}).execute()
+        
+        updated_ids = {s['id'] for s in response.data}
+        
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='UPDATE',
+            entity_type='student',
+            entity_name=f"{len(updated_ids)} students",
+            new_value={'changes': [c for c in changes if c['id'] in updated_ids]},
+            description=f"Updated {len(updated_ids)} students"
+        )
+        
+        return jsonify({
+            'students': response.data,
+            'not_found': [c['id'] for c in changes if c['id'] not in updated_ids]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/students/batch', methods=['DELETE'])
+@require_admin
+def delete_students_batch():
+    try:
+        data = request.json
+        student_ids = _batch_student_ids(data)
+        
+        if not student_ids:
+            return jsonify({'error': 'Student IDs are required'}), 400
+        
+        too_large = _batch_too_large(len(student_ids))
+        if too_large:
+            return too_large
+        
+        # ids go in the rpc body, not the query string
+        response = supabase.rpc('delete_students_batch', {'p_student_ids': student_ids}).execute()
+        
+        deleted = response.data
+        
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='DELETE',
+            entity_type='student',
+            entity_name=f"{len(deleted)} students",
+            old_value=[{'id': s['id'], 'full_name': s['full_name'], 'grade': s.get('grade')} for s in deleted],
+            description=f"Deleted {len(deleted)} students"
+        )
+        
+        return jsonify({
+            'message': f'{len(deleted)} students deleted successfully',
+            'deleted': len(deleted)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # csv import
 
+def _insert_students(students):
+    # the (name_key, grade) unique index does the duplicate check, so nothing
+    # is read back from the students table; conflicting rows are left alone
+    response = supabase.table('students').upsert(
+        students,
+        on_conflict='name_key,grade',
+        ignore_duplicates=True
+    ).execute()
+    
+    skipped, warnings = CSVStudentImporter.find_skipped(students, response.data)
+    return len(response.data), skipped, warnings
+
 @bp.route('/api/import-csv', methods=['POST'])
 @require_admin
 def import_students_csv():
@@ -101,29 +291,115 @@ def import_students_csv():
                 'errors': parse_errors
             }), 400
         
-        existing = supabase.table('students').select('full_name').execute()
-        
-        valid_students, warnings = CSVStudentImporter.validate_against_database(
-            students, 
-            existing.data
-        )
-        
         imported_count = 0
+        duplicates = []
+        warnings = []
         import_errors = []
         
-        if valid_students:
+        if students:
             try:
-                response = supabase.table('students').insert(valid_students).execute()
-                imported_count = len(response.data)
+                imported_count, duplicates, warnings = _insert_students(students)
             except Exception as e:
                 import_errors.append(f"Database import error: {str(e)}")
         
         summary = CSVStudentImporter.generate_import_summary(
             total_rows=len(students),
             imported=imported_count,
-            skipped=len(students) - len(valid_students),
+            skipped=len(students) - imported_count,
             errors=parse_errors + warnings + import_errors
         )
+        summary['duplicates'] = duplicates
+        
+        return jsonify(summary), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Import failed: {str(e)}'}), 500
+
+@bp.route('/api/import-csv/upload', methods=['POST'])
+@require_admin
+def upload_students_csv():
+    # multipart upload, parsed as a stream and inserted in chunks
+    try:
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'No CSV file provided'}), 400
+        
+        try:
+            chunk_size = max(1, int(request.form.get('chunk_size', Config.CSV_IMPORT_CHUNK_SIZE)))
+        except ValueError:
+            return jsonify({'error': 'chunk_size must be a number'}), 400
+        
+        total_rows = 0
+        imported_count = 0
+        errors = []
+        duplicates = []
+        chunks = []
+        buffer = []
+        
+        def flush():
+            nonlocal imported_count
+            report = {
+                'chunk': len(chunks) + 1,
+                'first_line': buffer[0][0],
+                'last_line': buffer[-1][0],
+                'rows': len(buffer),
+                'imported': 0,
+                'duplicates': 0,
+                'error': None
+            }
+            try:
+                inserted, skipped, warnings = _insert_students([student for _, student in buffer])
+                report['imported'] = inserted
+                report['duplicates'] = len(skipped)
+                imported_count += inserted
+                duplicates.extend(skipped)
+                errors.extend(warnings)
+            except Exception as e:
+                # a bad chunk doesn't stop the rest of the file
+                report['error'] = str(e)
+                errors.append(f"Lines {report['first_line']}-{report['last_line']}: Database import error: {str(e)}")
+            chunks.append(report)
+            buffer.clear()
+        
+        # decode lazily so the file is never held in memory as one string
+        lines = codecs.iterdecode(upload.stream, 'utf-8-sig')
+        last_line = 0
+        stopped_at_line = None
+        try:
+            for line_number, student, error in CSVStudentImporter.iter_rows(lines):
+                if line_number == 1:
+                    return jsonify({
+                        'error': 'CSV parsing failed',
+                        'errors': [error]
+                    }), 400
+                
+                last_line = line_number
+                total_rows += 1
+                if error:
+                    errors.append(error)
+                    continue
+                
+                buffer.append((line_number, student))
+                if len(buffer) >= chunk_size:
+                    flush()
+        except UnicodeDecodeError:
+            # earlier chunks are already in, so report what was imported
+            # instead of failing the whole upload
+            stopped_at_line = last_line + 1
+            errors.append(f"Line {stopped_at_line}: not valid UTF-8, stopped reading; the lines before it were imported")
+        
+        if buffer:
+            flush()
+        
+        summary = CSVStudentImporter.generate_import_summary(
+            total_rows=total_rows,
+            imported=imported_count,
+            skipped=total_rows - imported_count,
+            errors=errors
+        )
+        summary['duplicates'] = duplicates
+        summary['chunks'] = chunks
+        summary['stopped_at_line'] = stopped_at_line
         
         return jsonify(summary), 200
         
@@ -272,7 +548,8 @@ def create_week():
                 session_id=session_id,
                 participant_count=data.get('participant_count', 5),
                 grade_filter=data.get('grade_filter'),
-                reset_if_insufficient=data.get('reset_if_insufficient', False)
+                reset_if_insufficient=data.get('reset_if_insufficient', False),
+                store_seed=True
             )
             
             return jsonify({
@@ -280,6 +557,15 @@ def create_week():
                 'selection_result': result
             }), 201
             
+        elif participant_mode == 'planned':
+            # read this week's slot from the session rotation plan
+            result = _handle_planned_selection(week_id, session_id, week_number)
+            
+            return jsonify({
+                'week': week_response.data[0],
+                'selection_result': result
+            }), 201
+            
         elif participant_mode == 'manual' and data.get('student_ids'):
             # add selected students
             participants = [
@@ -305,28 +591,22 @@ def create_week():
         traceback.print_exc()  # Print full traceback
         return jsonify({'error': str(e)}), 500
 
-def _handle_random_selection(week_id, session_id, participant_count, grade_filter, reset_if_insufficient):
+def _handle_random_selection(week_id, session_id, participant_count, grade_filter, reset_if_insufficient,
+                             store_seed=False):
     # random selection logic
+    # every draw's seed goes in its SELECT audit entry; store_seed also keeps it on
+    # the week, only for the draw made when the week is created so a later draw
+    # can't overwrite it
     try:
-        # get active students
-        students_response = supabase.table('students')\
-            .select('*')\
-            .eq('is_active', True)\
-            .execute()
+        is_partial = False
         
-        # get speaker status
-        status_response = supabase.table('session_speaker_status')\
-            .select('*')\
-            .eq('session_id', session_id)\
-            .execute()
+        # candidate ids come back already filtered by the database
+        available_response = supabase.rpc('get_available_speakers', {
+            'p_session_id': session_id,
+            'p_grade': grade_filter
+        }).execute()
         
-        # filter available students
-        available_students = ExtemporeRandomSelector.get_available_students(
-            all_students=students_response.data,
-            session_id=session_id,
-            speaker_status=status_response.data,
-            grade_filter=grade_filter
-        )
+        available_students = [{'id': student_id} for student_id in available_response.data or []]
         
         # check if enough are available
         is_sufficient, message, recommendation = ExtemporeRandomSelector.check_availability(
@@ -340,15 +620,12 @@ def _handle_random_selection(week_id, session_id, participant_count, grade_filte
                 # reset and retry
                 _reset_session_speakers(session_id)
                 return _handle_random_selection(
-                    week_id, session_id, participant_count, grade_filter, False
+                    week_id, session_id, participant_count, grade_filter, False, store_seed
                 )
             elif len(available_students) > 0:
                 # use what we have
                 participant_count = len(available_students)
-                supabase.table('weeks')\
-                    .update({'is_partial': True})\
-                    .eq('id', week_id)\
-                    .execute()
+                is_partial = True
             else:
                 return {
                     'success': False,
@@ -356,10 +633,12 @@ def _handle_random_selection(week_id, session_id, participant_count, grade_filte
                     'recommendation': recommendation
                 }
         
-        # pick random students
+        # pick random students, the seed is kept for replay
+        seed = ExtemporeRandomSelector.new_seed()
         selected_students = ExtemporeRandomSelector.select_random_participants(
             available_students,
-            participant_count
+            participant_count,
+            seed=seed
         )
         
         # validate the selection
@@ -379,53 +658,98 @@ def _handle_random_selection(week_id, session_id, participant_count, grade_filte
         student_ids = [s['id'] for s in selected_students]
         _mark_students_as_spoken(session_id, student_ids, week_id)
         
+        week_update = {}
+        if store_seed:
+            week_update['selection_seed'] = seed
+        if is_partial:
+            week_update['is_partial'] = True
+        if week_update:
+            supabase.table('weeks').update(week_update).eq('id', week_id).execute()
+        
+        # enough to replay the draw: sorted candidates, count and seed
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='SELECT',
+            entity_type='week',
+            entity_id=week_id,
+            entity_name=f"Week {week_id}",
+            new_value={
+                'seed': seed,
+                'count': participant_count,
+                'grade_filter': grade_filter,
+                'candidate_ids': sorted(s['id'] for s in available_students),
+                'selected_ids': student_ids
+            },
+            description=f"Randomly selected {len(student_ids)} participants"
+        )
+        
         return {
             'success': True,
             'message': f'Selected {len(selected_students)} participants',
             'participant_count': len(selected_students),
-            'is_partial': len(selected_students) < participant_count
+            'is_partial': is_partial,
+            'seed': seed
         }
         
     except Exception as e:
         return {'success': False, 'message': f'Selection error: {str(e)}'}
 
-def _mark_students_as_spoken(session_id, student_ids, week_id):
-    # mark students as having spoken
+def _handle_planned_selection(week_id, session_id, week_number):
+    # participants come straight from the stored rotation plan
     try:
-        # get current status
-        existing = supabase.table('session_speaker_status')\
-            .select('*')\
+        slot = supabase.table('speaker_rotation_slots')\
+            .select('student_ids, is_partial')\
             .eq('session_id', session_id)\
-            .in_('student_id', student_ids)\
+            .eq('week_number', week_number)\
             .execute()
         
-        existing_student_ids = {record['student_id'] for record in existing.data}
-        
-        # update existing records
-        if existing.data:
-            for student_id in existing_student_ids:
-                supabase.table('session_speaker_status')\
-                    .update({
-                        'has_spoken': True,
-                        'spoken_in_week_id': week_id
-                    })\
-                    .eq('session_id', session_id)\
-                    .eq('student_id', student_id)\
-                    .execute()
-        
-        # insert new records
-        new_student_ids = set(student_ids) - existing_student_ids
-        if new_student_ids:
-            new_records = [
-                {
-                    'session_id': session_id,
-                    'student_id': student_id,
-                    'has_spoken': True,
-                    'spoken_in_week_id': week_id
-                }
-                for student_id in new_student_ids
-            ]
-            supabase.table('session_speaker_status').insert(new_records).execute()
+        if not slot.data:
+            return {'success': False, 'message': f'No rotation slot planned for week {week_number}'}
+        
+        student_ids = slot.data[0]['student_ids']
+        participant_records = ExtemporeRandomSelector.prepare_participant_records(
+            week_id,
+            [{'id': student_id} for student_id in student_ids]
+        )
+        
+        supabase.table('participants').insert(participant_records).execute()
+        _mark_students_as_spoken(session_id, student_ids, week_id)
+        
+        if slot.data[0]['is_partial']:
+            supabase.table('weeks')\
+                .update({'is_partial': True})\
+                .eq('id', week_id)\
+                .execute()
+        
+        return {
+            'success': True,
+            'message': f'Selected {len(student_ids)} planned participants',
+            'participant_count': len(student_ids),
+            'is_partial': slot.data[0]['is_partial']
+        }
+        
+    except Exception as e:
+        return {'success': False, 'message': f'Selection error: {str(e)}'}
+
+def _mark_students_as_spoken(session_id, student_ids, week_id):
+    # mark students as having spoken, one upsert for the whole selection
+    try:
+        # duplicates in one upsert would hit the same row twice
+        unique_ids = list(dict.fromkeys(student_ids))
+        if not unique_ids:
+            return
+        
+        records = ExtemporeRandomSelector.create_speaker_status_records(
+            session_id,
+            unique_ids,
+            week_id
+        )
+        
+        supabase.table('session_speaker_status')\
+            .upsert(records, on_conflict='session_id,student_id')\
+            .execute()
             
     except Exception as e:
         print(f"Error marking students as spoken: {e}")
@@ -448,24 +772,27 @@ def _reset_session_speakers(session_id):
 def get_week_details(week_id):
     # get week with all details
     try:
-        # get week with session and event info
-        week_response = supabase.table('weeks')\
-            .select('*, sessions!inner(session_number, name, events!inner(name, name_nepali))')\
-            .eq('id', week_id)\
-            .execute()
-        
-        if not week_response.data:
+        # week and participants don't depend on each other
+        outcome = fan_out({
+            'week': lambda: supabase.table('weeks')\
+                .select('*, sessions!inner(session_number, name, events!inner(name, name_nepali))')\
+                .eq('id', week_id)\
+                .execute().data,
+            'participants': lambda: supabase.table('participants')\
+                .select('*, students!inner(full_name, grade)')\
+                .eq('week_id', week_id)\
+                .execute().data
+        })
+        
+        if not outcome.ok:
+            return jsonify({'error': 'Failed to load week', 'details': outcome.errors}), 500
+        
+        if not outcome.get('week'):
             return jsonify({'error': 'Week not found'}), 404
         
-        week = week_response.data[0]
+        week = outcome.get('week')[0]
         
-        # get participants
-        participants_response = supabase.table('participants')\
-            .select('*, students!inner(full_name, grade)')\
-            .eq('week_id', week_id)\
-            .execute()
-        
-        week['participants'] = participants_response.data
+        week['participants'] = outcome.get('participants')
         
         return jsonify({'week': week}), 200
     except Exception as e:
@@ -488,6 +815,8 @@ def update_week(week_id):
             .eq('id', week_id)\
             .execute()
         
+        bump_publish_version(week_id)
+        
         return jsonify({'week': response.data[0]}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -498,6 +827,7 @@ def delete_week(week_id):
     # delete by id
     try:
         supabase.table('weeks').delete().eq('id', week_id).execute()
+        bump_publish_version(week_id)
         return jsonify({'message': 'Week deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -557,6 +887,90 @@ def reset_session_speakers(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# speaker rotation plan
+
+@bp.route('/api/sessions/<session_id>/rotation-plan', methods=['GET'])
+@require_admin
+def get_rotation_plan(session_id):
+    try:
+        response = supabase.table('speaker_rotation_slots')\
+            .select('*')\
+            .eq('session_id', session_id)\
+            .order('week_number')\
+            .execute()
+        
+        return jsonify({'slots': response.data}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/sessions/<session_id>/rotation-plan', methods=['POST'])
+@require_admin
+def create_rotation_plan(session_id):
+    # plan every week of the session in one pass
+    try:
+        data = request.json
+        
+        # either explicit weeks or a uniform schedule
+        week_specs = data.get('weeks')
+        if not week_specs:
+            week_count = ExtemporeRandomSelector.parse_positive_int(data.get('week_count'))
+            start_week = ExtemporeRandomSelector.parse_positive_int(data.get('start_week', 1))
+            if week_count is None:
+                return jsonify({'error': 'Provide weeks or a positive week_count'}), 400
+            if start_week is None:
+                return jsonify({'error': 'start_week must be a positive integer'}), 400
+            
+            week_specs = [
+                {
+                    'week_number': start_week + offset,
+                    'count': data.get('participant_count', 5),
+                    'grade_filter': data.get('grade_filter')
+                }
+                for offset in range(week_count)
+            ]
+        
+        week_specs, error = ExtemporeRandomSelector.normalize_week_specs(week_specs)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # whole roster as one array, a plain select would stop at the api row limit
+        # students who already spoke this cycle are flagged so they go last
+        roster = supabase.rpc('get_active_student_roster', {'p_session_id': session_id}).execute().data or []
+        
+        seed = data.get('seed')
+        if seed is None:
+            seed = ExtemporeRandomSelector.new_seed()
+        
+        slots = ExtemporeRandomSelector.plan_session_rotation(
+            roster,
+            week_specs,
+            seed=seed
+        )
+        
+        # a new plan replaces the old one; delete and insert happen in one
+        # transaction, so a failure keeps the old plan
+        response = supabase.rpc('replace_rotation_plan', {
+            'p_session_id': session_id,
+            'p_seed': seed,
+            'p_slots': slots
+        }).execute()
+        
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='CREATE',
+            entity_type='session',
+            entity_id=session_id,
+            entity_name=f"Rotation plan ({len(slots)} weeks)",
+            new_value={'weeks': week_specs, 'seed': seed},
+            description=f"Planned speaker rotation for {len(slots)} weeks"
+        )
+        
+        return jsonify({'slots': response.data}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # participant management
 
 @bp.route('/api/participants/<participant_id>', methods=['PUT'])
@@ -581,6 +995,8 @@ def update_participant(participant_id):
             .eq('id', participant_id)\
             .execute()
         
+        bump_publish_version(response.data[0]['week_id'])
+        
         return jsonify({'participant': response.data[0]}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -604,6 +1020,8 @@ def add_participant():
             'notes': data.get('notes')
         }).execute()
         
+        bump_publish_version(data['week_id'])
+        
         # log the action
         admin_email, admin_id = get_admin_email_from_request()
         student = supabase.table('students').select('full_name').eq('id', data['student_id']).execute()
@@ -624,6 +1042,54 @@ def add_participant():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/api/weeks/<week_id>/participants', methods=['POST'])
+@require_admin
+def add_participants_to_week(week_id):
+    # add several students to a week at once
+    try:
+        data = request.json
+        student_ids = list(dict.fromkeys(data.get('student_ids') or []))
+        
+        if not student_ids:
+            return jsonify({'error': 'Student IDs are required'}), 400
+        
+        week = supabase.table('weeks').select('session_id').eq('id', week_id).execute()
+        if not week.data:
+            return jsonify({'error': 'Week not found'}), 404
+        
+        participant_records = [
+            {
+                'week_id': week_id,
+                'student_id': student_id,
+                'score': 0,
+                'is_winner': False
+            }
+            for student_id in student_ids
+        ]
+        response = supabase.table('participants').insert(participant_records).execute()
+        
+        if data.get('mark_as_spoken', True):
+            _mark_students_as_spoken(week.data[0]['session_id'], student_ids, week_id)
+        
+        bump_publish_version(week_id)
+        
+        # log the action
+        admin_email, admin_id = get_admin_email_from_request()
+        AuditLogger.log_action(
+            admin_email=admin_email,
+            admin_id=admin_id,
+            action_type='CREATE',
+            entity_type='participant',
+            entity_id=week_id,
+            entity_name=f"Week {week_id}",
+            new_value={'student_ids': student_ids, 'week_id': week_id},
+            description=f"Added {len(response.data)} participants to week"
+        )
+        
+        return jsonify({'participants': response.data}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/api/participants/<participant_id>', methods=['DELETE'])
 @require_admin
 def remove_participant(participant_id):
@@ -637,6 +1103,9 @@ def remove_participant(participant_id):
         
         supabase.table('participants').delete().eq('id', participant_id).execute()
         
+        if participant.data:
+            bump_publish_version(participant.data[0]['week_id'])
+        
         # log the action
         admin_email, admin_id = get_admin_email_from_request()
         student_name = participant.data[0]['students']['full_name'] if participant.data else 'Unknown'
@@ -780,43 +1249,168 @@ def get_all_criteria():
 
 # audit logs
 
+MAX_AUDIT_LOGS_PAGE = 500
+AUDIT_EXPORT_PAGE = 1000
+# the list view leaves out old_value/new_value, they can be large
+AUDIT_LOG_COLUMNS = 'id, created_at, admin_email, admin_id, action_type, entity_type, entity_id, entity_name, description'
+AUDIT_EXPORT_FIELDS = AUDIT_LOG_COLUMNS.split(', ') + ['old_value', 'new_value']
+
+def _audit_logs_query(args, columns, limit, cursor=None):
+    # newest first, keyset on (created_at, id) so deep pages cost the same as the first
+    query = supabase.table('audit_logs')\
+        .select(columns)\
+        .order('created_at', desc=True)\
+        .order('id', desc=True)\
+        .limit(limit)
+    
+    # apply filters if given
+    if args.get('action_type'):
+        query = query.eq('action_type', args['action_type'])
+    if args.get('entity_type'):
+        query = query.eq('entity_type', args['entity_type'])
+    if args.get('entity_id'):
+        query = query.eq('entity_id', args['entity_id'])
+    if args.get('admin_email'):
+        # served by the trigram index on admin_email
+        query = query.ilike('admin_email', f"%{args['admin_email']}%")
+    
+    # a lower bound on created_at lets postgres skip older monthly partitions
+    since = _audit_logs_since(args)
+    if since:
+        query = query.gte('created_at', since)
+    
+    if cursor:
+        created_at, log_id = parse_cursor(cursor, 'timestamp', 'uuid')
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{log_id})'
+        )
+    
+    return query
+
+def _audit_logs_since(args):
+    # explicit ?since=, everything with ?all=true, else the recent window
+    if args.get('since'):
+        return parse_timestamp(args['since'])
+    if args.get('all') in ('true', '1') or Config.AUDIT_QUERY_WINDOW_DAYS <= 0:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=Config.AUDIT_QUERY_WINDOW_DAYS)).isoformat()
+
+def _audit_cursor(row):
+    return f"{row['created_at']}|{row['id']}"
+
 @bp.route('/api/audit-logs', methods=['GET'])
 @require_admin
 def get_audit_logs():
-    # get audit logs
+    # get audit logs, one page at a time
     try:
-        query = supabase.table('audit_logs').select('*')
+        limit = parse_limit(request.args.get('limit'), 100, MAX_AUDIT_LOGS_PAGE)
+        columns = AUDIT_LOG_COLUMNS
+        if request.args.get('include_values') in ('true', '1'):
+            columns += ', old_value, new_value'
         
-        # apply filters if given
-        action_type = request.args.get('action_type')
-        entity_type = request.args.get('entity_type')
-        admin_email = request.args.get('admin_email')
-        limit = request.args.get('limit', 100)
+        rows = _audit_logs_query(request.args, columns, limit + 1, request.args.get('cursor')).execute().data
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
-        if action_type:
-            query = query.eq('action_type', action_type)
-        if entity_type:
-            query = query.eq('entity_type', entity_type)
-        if admin_email:
-            query = query.ilike('admin_email', f'%{admin_email}%')
+        return jsonify({
+            'logs': rows,
+            'next_cursor': _audit_cursor(rows[-1]) if has_more else None
+        }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/audit-logs/<log_id>', methods=['GET'])
+@require_admin
+def get_audit_log(log_id):
+    # single entry with its old/new values, for the details view
+    try:
+        response = supabase.table('audit_logs').select('*').eq('id', log_id).execute()
         
-        response = query.order('created_at', desc=True).limit(limit).execute()
+        if not response.data:
+            return jsonify({'error': 'Audit log not found'}), 404
         
-        return jsonify({'logs': response.data}), 200
+        return jsonify({'log': response.data[0]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/audit-logs/export', methods=['GET'])
+@require_admin
+def export_audit_logs():
+    # stream every matching entry as ndjson (default) or csv, a page at a time
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    
+    args = request.args.to_dict()
+    
+    # bad input has to fail before the response starts streaming
+    try:
+        _audit_logs_since(args)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def pages():
+        cursor = None
+        while True:
+            rows = _audit_logs_query(args, '*', AUDIT_EXPORT_PAGE, cursor).execute().data
+            if rows:
+                yield rows
+            if len(rows) < AUDIT_EXPORT_PAGE:
+                return
+            cursor = _audit_cursor(rows[-1])
+    
+    def generate_ndjson():
+        for rows in pages():
+            yield ''.join(json.dumps({k: row.get(k) for k in AUDIT_EXPORT_FIELDS}) + '\n' for row in rows)
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=AUDIT_EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for rows in pages():
+            for row in rows:
+                writer.writerow({
+                    k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                    for k, v in row.items()
+                })
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # header only when nothing matched
+        if buffer.getvalue():
+            yield buffer.getvalue()
+    
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=audit_logs.{export_format}'}
+    )
+
+@bp.route('/api/admin-cache/invalidate', methods=['POST'])
+@require_admin
+def invalidate_admin_membership_cache():
+    # drop cached admin membership after editing the admins table
+    try:
+        data = request.get_json(silent=True) or {}
+        invalidate_admin_cache(data.get('user_id'))
+        return jsonify({'message': 'Admin cache cleared'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 def get_admin_email_from_request():
     # get admin email from request
     try:
-        # get the token
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
-            # get user info
-            user = supabase.auth.get_user(token)
-            if user and user.user:
-                return user.user.email, user.user.id
+        identity = get_current_identity(allow_cookie=True)
+        if identity:
+            return identity.email, identity.user_id
         return 'unknown@admin.com', None
     except Exception as e:
         print(f"Error getting admin email: {e}")
@@ -824,31 +1418,48 @@ def get_admin_email_from_request():
 
 # judge permissions
 
+MAX_PERMISSIONS_PAGE = 500
+
 @bp.route('/api/judge-permissions', methods=['GET'])
 @require_admin
 def get_judge_permissions():
-    # get all judge permissions
+    # get judge permissions, newest first, with week details embedded
     try:
-        response = supabase.table('judge_permissions')\
-            .select('*')\
+        limit = parse_limit(request.args.get('limit'), 100, MAX_PERMISSIONS_PAGE)
+        
+        query = supabase.table('judge_permissions')\
+            .select('*, week:weeks(week_number, topic, session_id, sessions(session_number, name, events(name)))')\
             .order('granted_at', desc=True)\
-            .execute()
+            .order('id', desc=True)\
+            .limit(limit + 1)
         
-        # attach week details
-        for permission in response.data:
-            if permission.get('week_id'):
-                try:
-                    week = supabase.table('weeks')\
-                        .select('week_number, topic, session_id')\
-                        .eq('id', permission['week_id'])\
-                        .single()\
-                        .execute()
-                    if week.data:
-                        permission['week'] = week.data
-                except:
-                    permission['week'] = None
-        
-        return jsonify({'permissions': response.data}), 200
+        # apply filters if given
+        if request.args.get('active') in ('true', '1'):
+            query = query.eq('is_active', True)
+        if request.args.get('week_id'):
+            query = query.eq('week_id', request.args['week_id'])
+        if request.args.get('user_email'):
+            query = query.eq('user_email', request.args['user_email'])
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            # keyset on (granted_at, id)
+            granted_at, permission_id = parse_cursor(cursor, 'timestamp', 'uuid')
+            query = query.or_(
+                f'granted_at.lt."{granted_at}",'
+                f'and(granted_at.eq."{granted_at}",id.lt.{permission_id})'
+            )
+        
+        rows = query.execute().data
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            'permissions': rows,
+            'next_cursor': f"{rows[-1]['granted_at']}|{rows[-1]['id']}" if has_more else None
+        }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_judge_permissions: {e}")
         error_msg = str(e)
@@ -879,6 +1490,8 @@ def grant_judge_permission():
             'is_active': True
         }).execute()
         
+        judge_permission_index.put(response.data[0])
+        
         # log the action
         AuditLogger.log_action(
             admin_email=admin_email,
@@ -911,6 +1524,9 @@ def revoke_judge_permission(permission_id):
             .eq('id', permission_id)\
             .execute()
         
+        for permission in response.data:
+            judge_permission_index.put(permission)
+        
         # log the action
         AuditLogger.log_action(
             admin_email=admin_email,
@@ -941,6 +1557,9 @@ def reactivate_judge_permission(permission_id):
             .eq('id', permission_id)\
             .execute()
         
+        for permission in response.data:
+            judge_permission_index.put(permission)
+        
         # log the action
         AuditLogger.log_action(
             admin_email=admin_email,
@@ -962,87 +1581,22 @@ def reactivate_judge_permission(permission_id):
 def get_week_results(week_id):
     # get aggregated results for a week
     try:
-        # get participants
-        participants = supabase.table('participants')\
-            .select('id, student_id')\
-            .eq('week_id', week_id)\
-            .execute()
-        
-        print(f"Fetched {len(participants.data)} participants for week {week_id}")
-        
-        results = []
-        
-        for participant in participants.data:
-            participant_id = participant['id']
-            student_id = participant['student_id']
-            
-            # get student data
-            try:
-                student_response = supabase.table('students')\
-                    .select('*')\
-                    .eq('id', student_id)\
-                    .single()\
-                    .execute()
-                student = student_response.data
-            except Exception as student_error:
-                print(f"Error fetching student {student_id}: {student_error}")
-                continue
-            
-            if not student:
-                print(f"Warning: No student data for participant {participant_id}")
-                continue
-            
-            # get scores
-            try:
-                scores = supabase.table('judge_scores')\
-                    .select('*')\
-                    .eq('participant_id', participant_id)\
-                    .execute()
-                print(f"Fetched {len(scores.data)} scores for participant {participant_id}")
-                if scores.data:
-                    for score in scores.data:
-                        print(f"  Score: {score}")
-            except Exception as score_error:
-                # use empty if table doesn't exist
-                print(f"Error fetching scores: {score_error}")
-                scores = type('obj', (object,), {'data': []})()
-            
-            # aggregate by type
-            overall_score = None
-            content_score = None
-            style_delivery_score = None
-            language_score = None
-            
-            for score in scores.data:
-                judge_type = score.get('judge_type')
-                if judge_type == 'overall':
-                    overall_score = score.get('score')
-                elif judge_type == 'content':
-                    content_score = score.get('score')
-                elif judge_type == 'style_delivery':
-                    style_delivery_score = score.get('score')
-                elif judge_type == 'language':
-                    language_score = score.get('score')
-            
-            # sum all scores
-            total_score = sum(filter(None, [overall_score, content_score, style_delivery_score, language_score]))
-            
-            # prefer full_name
-            student_name = student.get('name') or student.get('full_name', 'Unknown')
-            
-            results.append({
-                'participant_id': participant_id,
-                'student_name': student_name,
-                'roll_number': student.get('roll_number', 'N/A'),
-                'overall_score': overall_score,
-                'content_score': content_score,
-                'style_delivery_score': style_delivery_score,
-                'language_score': language_score,
-                'total_score': total_score
-            })
-        
-        # sort by score
-        results.sort(key=lambda x: x['total_score'], reverse=True)
+        standings = load_week_standings(supabase, week_id)
+        
+        results = [
+            {
+                'participant_id': standing['participant_id'],
+                'student_name': standing['student_name'],
+                'roll_number': standing['roll_number'],
+                'rank': standing['rank'],
+                'overall_score': standing['overall_score'],
+                'content_score': standing['content_score'],
+                'style_delivery_score': standing['style_delivery_score'],
+                'language_score': standing['language_score'],
+                'total_score': standing['total_score']
+            }
+            for standing in standings
+        ]
         
         print(f"Returning {len(results)} results")
         return jsonify({'results': results}), 200
@@ -1106,62 +1660,16 @@ def publish_winners(week_id):
     try:
         admin_email, admin_id = get_admin_email_from_request()
         
-        # get all participants
-        participants = supabase.table('participants')\
-            .select('id, student_id')\
-            .eq('week_id', week_id)\
-            .execute()
+        # rank and write every position in one transaction
+        response = supabase.rpc('publish_week_results', {'p_week_id': week_id}).execute()
+        standings = response.data
         
-        if not participants.data:
+        if not standings:
             return jsonify({'error': 'No participants found for this week'}), 404
         
-        # calculate scores
-        results = []
-        for participant in participants.data:
-            participant_id = participant['id']
-            
-            # get scores
-            scores = supabase.table('judge_scores')\
-                .select('*')\
-                .eq('participant_id', participant_id)\
-                .execute()
-            
-            # sum scores
-            total_score = 0
-            for score in scores.data:
-                total_score += score.get('score', 0)
-            
-            results.append({
-                'participant_id': participant_id,
-                'total_score': total_score
-            })
-        
-        # sort by score
-        results.sort(key=lambda x: x['total_score'], reverse=True)
+        published_count = len(standings)
         
-        if len(results) == 0:
-            return jsonify({'error': 'No scores available to determine winners'}), 400
-        
-        # clear existing winners
-        supabase.table('participants')\
-            .update({'is_winner': False})\
-            .eq('week_id', week_id)\
-            .execute()
-        
-        # assign positions, top 3 get is_winner
-        published_count = 0
-        for index, result in enumerate(results):
-            position = index + 1
-            is_winner = position <= 3
-            
-            supabase.table('participants')\
-                .update({
-                    'is_winner': is_winner,
-                    'position': position
-                })\
-                .eq('id', result['participant_id'])\
-                .execute()
-            published_count += 1
+        bump_publish_version(week_id)
         
         # log this action
         AuditLogger.log_action(
@@ -1171,13 +1679,14 @@ def publish_winners(week_id):
             entity_type='week',
             entity_id=week_id,
             entity_name=f"Week Results Published",
-            new_value={'published_count': published_count, 'total_participants': len(results)},
+            new_value={'published_count': published_count, 'total_participants': len(standings)},
             description=f"Published results and rankings for {published_count} participants"
         )
         
         return jsonify({
             'message': 'Winners published successfully',
-            'published_count': published_count
+            'published_count': published_count,
+            'standings': standings
         }), 200
         
     except Exception as e:
@@ -1228,6 +1737,8 @@ def unpublish_winners(week_id):
             .eq('week_id', week_id)\
             .execute()
         
+        bump_publish_version(week_id)
+        
         # log this action
         AuditLogger.log_action(
             admin_email=admin_email,
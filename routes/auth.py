@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, make_response
 from supabase import create_client
 from config import Config
-from utils.auth import is_user_admin
+from utils.auth import is_user_admin, get_current_identity
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -130,22 +130,17 @@ def logout():
 @bp.route('/verify', methods=['GET'])
 def verify_token():
     try:
-        token = request.headers.get('Authorization')
-        
-        if not token:
+        if not request.headers.get('Authorization'):
             return jsonify({'error': 'No token provided'}), 401
         
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
-        user = supabase.auth.get_user(token)
+        identity = get_current_identity()
         
-        if user and user.user:
-            is_admin = is_user_admin(user.user.id)
+        if identity:
+            is_admin = is_user_admin(identity.user_id)
             return jsonify({
                 'user': {
-                    'id': user.user.id,
-                    'email': user.user.email
+                    'id': identity.user_id,
+                    'email': identity.email
                 },
                 'is_admin': is_admin
             }), 200
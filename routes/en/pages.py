@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template
+from config import Config
 
 # english page routes
 
@@ -54,7 +55,7 @@ def admin_weeks_page():
 
 @bp.route('/admin/logs')
 def admin_logs_page():
-    return render_template('admin/logs.html', lang=LANG)
+    return render_template('admin/logs.html', lang=LANG, audit_window_days=Config.AUDIT_QUERY_WINDOW_DAYS)
 
 @bp.route('/admin/judge-permissions')
 def admin_judge_permissions_page():
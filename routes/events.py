@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from supabase import create_client
 from config import Config
 from utils.auth import require_auth
+from utils.http_cache import cached_public_response, publish_versions
+from utils.fanout import fan_out
+from utils.cursors import InvalidCursor, parse_cursor, parse_limit
+from utils.score_aggregator import load_week_standings
 
 bp = Blueprint('events', __name__)
 api_bp = Blueprint('events_api', __name__, url_prefix='/api')
@@ -11,6 +15,7 @@ api_bp = Blueprint('events_api', __name__, url_prefix='/api')
 supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
 
 @api_bp.route('/events', methods=['GET'])
+@cached_public_response(lambda: publish_versions.epoch())
 def get_events():
     try:
         response = supabase.table('events').select('*').execute()
@@ -56,69 +61,137 @@ def get_weeks(session_id):
 @require_auth
 def get_week_detail(week_id):
     try:
-        week_response = supabase.table('weeks')\
-            .select('*, sessions!inner(session_number, name, event_id, events!inner(name, name_nepali))')\
-            .eq('id', week_id)\
-            .single()\
-            .execute()
+        # the four lookups are independent, run them together
+        outcome = fan_out({
+            'week': lambda: supabase.table('weeks')\
+                .select('*, sessions!inner(session_number, name, event_id, events!inner(name, name_nepali))')\
+                .eq('id', week_id)\
+                .single()\
+                .execute().data,
+            'participants': lambda: supabase.table('participants')\
+                .select('*, students!inner(full_name, grade)')\
+                .eq('week_id', week_id)\
+                .order('score', desc=True)\
+                .execute().data,
+            'judges': lambda: supabase.table('week_judges')\
+                .select('*, judges!inner(full_name, title)')\
+                .eq('week_id', week_id)\
+                .execute().data,
+            'criteria': lambda: supabase.table('week_criteria')\
+                .select('*, judging_criteria!inner(name, name_nepali, max_points)')\
+                .eq('week_id', week_id)\
+                .execute().data
+        })
         
-        participants_response = supabase.table('participants')\
-            .select('*, students!inner(full_name, grade)')\
-            .eq('week_id', week_id)\
-            .order('score', desc=True)\
-            .execute()
+        if 'week' in outcome.errors:
+            return jsonify({'error': outcome.errors['week']}), 500
         
-        judges_response = supabase.table('week_judges')\
-            .select('*, judges!inner(full_name, title)')\
-            .eq('week_id', week_id)\
-            .execute()
+        response = {
+            'week': outcome.get('week'),
+            'participants': outcome.get('participants', []),
+            'judges': outcome.get('judges', []),
+            'criteria': outcome.get('criteria', [])
+        }
         
-        criteria_response = supabase.table('week_criteria')\
-            .select('*, judging_criteria!inner(name, name_nepali, max_points)')\
-            .eq('week_id', week_id)\
-            .execute()
+        # report the parts that failed instead of failing the page
+        if not outcome.ok:
+            response['errors'] = outcome.errors
         
-        return jsonify({
-            'week': week_response.data,
-            'participants': participants_response.data,
-            'judges': judges_response.data,
-            'criteria': criteria_response.data
-        }), 200
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# weeks usually publish a top 3
+WINNERS_PER_WEEK = 3
+MAX_WINNER_WEEKS = 200
+
+def _winner_cursor(row):
+    return f"{row['sort_date']}|{row['week_id']}|{row['position']}"
+
 @api_bp.route('/winners', methods=['GET'])
+@cached_public_response(lambda: publish_versions.epoch(), query_args=('event_id', 'lang', 'cursor', 'limit'))
 def get_winners():
     try:
         event_id = request.args.get('event_id')
-        limit = request.args.get('limit', 50)
+        language = request.args.get('lang')
+        cursor = request.args.get('cursor')
+        limit = parse_limit(request.args.get('limit'), 50, MAX_WINNER_WEEKS)
+        page_size = limit * WINNERS_PER_WEEK
         
-        # get weeks with winners
-        query = supabase.table('weeks')\
-            .select('id, week_number, topic, topic_nepali, date, sessions!inner(session_number, event_id, events!inner(name, name_nepali))')\
-            .order('date', desc=True)\
-            .limit(limit)
+        # one query against the winners view, newest first
+        query = supabase.table('recent_winners')\
+            .select('*')\
+            .order('sort_date', desc=True)\
+            .order('week_id')\
+            .order('position')\
+            .limit(page_size + 1)
         
         if event_id:
-            query = query.eq('sessions.event_id', event_id)
+            query = query.eq('event_id', event_id)
+        if language in ('en', 'ne'):
+            query = query.eq('session_language', language)
+        
+        if cursor:
+            # keyset: everything after the last row of the previous page
+            sort_date, week_id, position = parse_cursor(cursor, 'date', 'uuid', 'int')
+            query = query.or_(
+                f'sort_date.lt.{sort_date},'
+                f'and(sort_date.eq.{sort_date},week_id.gt.{week_id}),'
+                f'and(sort_date.eq.{sort_date},week_id.eq.{week_id},position.gt.{position})'
+            )
+        
+        rows = query.execute().data
+        has_more = len(rows) > page_size
         
-        weeks_response = query.execute()
+        if has_more:
+            # drop a week cut off by the page boundary, it starts the next page
+            last_week_id = rows[page_size - 1]['week_id']
+            if rows[page_size]['week_id'] == last_week_id and rows[0]['week_id'] != last_week_id:
+                rows = [r for r in rows[:page_size] if r['week_id'] != last_week_id]
+            else:
+                rows = rows[:page_size]
         
-        # Filter weeks that have winners
+        # group winners under their week
         weeks_with_winners = []
-        for week in weeks_response.data:
-            winners_check = supabase.table('participants')\
-                .select('id', count='exact')\
-                .eq('week_id', week['id'])\
-                .eq('is_winner', True)\
-                .execute()
-            
-            if winners_check.count and winners_check.count > 0:
+        weeks_by_id = {}
+        for row in rows:
+            week = weeks_by_id.get(row['week_id'])
+            if week is None:
+                week = {
+                    'id': row['week_id'],
+                    'week_number': row['week_number'],
+                    'topic': row['topic'],
+                    'topic_nepali': row['topic_nepali'],
+                    'date': row['date'],
+                    'sessions': {
+                        'session_number': row['session_number'],
+                        'event_id': row['event_id'],
+                        'events': {
+                            'name': row['event_name'],
+                            'name_nepali': row['event_name_nepali']
+                        }
+                    },
+                    'winners': []
+                }
+                weeks_by_id[row['week_id']] = week
                 weeks_with_winners.append(week)
+            
+            week['winners'].append({
+                'participant_id': row['id'],
+                'student_id': row['student_id'],
+                'full_name': row['full_name'],
+                'score': row['score'],
+                'position': row['position']
+            })
         
-        return jsonify({'weeks': weeks_with_winners}), 200
+        return jsonify({
+            'weeks': weeks_with_winners,
+            'next_cursor': _winner_cursor(rows[-1]) if has_more and rows else None
+        }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_winners: {e}")
         import traceback
@@ -126,10 +199,9 @@ def get_winners():
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/week-rankings/<week_id>', methods=['GET'])
+@cached_public_response(lambda week_id: publish_versions.week(week_id))
 def get_week_rankings(week_id):
     try:
-        print(f"Getting rankings for week: {week_id}")
-        
         # get week info
         week = supabase.table('weeks')\
             .select('*, sessions!inner(session_number, events!inner(name, name_nepali))')\
@@ -137,82 +209,27 @@ def get_week_rankings(week_id):
             .single()\
             .execute()
         
-        print(f"Week info: {week.data}")
-        
-        # get participants
-        participants = supabase.table('participants')\
-            .select('id, student_id, position, is_winner')\
-            .eq('week_id', week_id)\
-            .execute()
-        
-        print(f"Found {len(participants.data)} participants")
-        
-        # Get student info and scores for each participant
-        results = []
-        for participant in participants.data:
-            print(f"\nProcessing participant: {participant['id']}")
-            
-            student = supabase.table('students')\
-                .select('*')\
-                .eq('id', participant['student_id'])\
-                .single()\
-                .execute()
-            
-            # get scores
-            scores = supabase.table('judge_scores')\
-                .select('*')\
-                .eq('participant_id', participant['id'])\
-                .execute()
-            
-            print(f"Found {len(scores.data)} scores for participant {participant['id']}")
-            print(f"Scores data: {scores.data}")
-            
-            # calculate scores by type
-            overall_score = None
-            content_score = None
-            style_delivery_score = None
-            language_score = None
-            
-            for score in scores.data:
-                judge_type = score.get('judge_type')
-                score_value = score.get('score')
-                print(f"  Judge type: {judge_type}, Score: {score_value}")
-                
-                if judge_type == 'overall':
-                    overall_score = score_value
-                elif judge_type == 'content':
-                    content_score = score_value
-                elif judge_type == 'style_delivery':
-                    style_delivery_score = score_value
-                elif judge_type == 'language':
-                    language_score = score_value
-            
-            # total score
-            scores_list = [overall_score, content_score, style_delivery_score, language_score]
-            filtered_scores = list(filter(None, scores_list))
-            total_score = sum(filtered_scores) if filtered_scores else 0
-            
-            print(f"Scores list: {scores_list}")
-            print(f"Filtered scores: {filtered_scores}")
-            print(f"Calculated scores - Overall: {overall_score}, Content: {content_score}, Style/Delivery: {style_delivery_score}, Language: {language_score}, Total: {total_score}")
-            
-            results.append({
-                'position': participant.get('position'),
-                'is_winner': participant.get('is_winner', False),
-                'student_name': student.data.get('full_name') or student.data.get('name', 'Unknown'),
-                'roll_number': student.data.get('roll_number', 'N/A'),
-                'grade': student.data.get('grade', 'N/A'),
-                'overall_score': overall_score,
-                'content_score': content_score,
-                'style_delivery_score': style_delivery_score,
-                'language_score': language_score,
-                'total_score': total_score
-            })
+        standings = load_week_standings(supabase, week_id)
         
-        # sort by position
-        results.sort(key=lambda x: x['position'] if x['position'] else 999)
+        results = [
+            {
+                'position': standing['position'],
+                'rank': standing['rank'],
+                'is_winner': standing['is_winner'],
+                'student_name': standing['student_name'],
+                'roll_number': standing['roll_number'],
+                'grade': standing['grade'],
+                'overall_score': standing['overall_score'],
+                'content_score': standing['content_score'],
+                'style_delivery_score': standing['style_delivery_score'],
+                'language_score': standing['language_score'],
+                'total_score': standing['total_score']
+            }
+            for standing in standings
+        ]
         
-        print(f"\nReturning {len(results)} results")
+        # published position first, live rank for unpublished weeks
+        results.sort(key=lambda x: (x['position'] or 999, x['rank']))
         
         return jsonify({
             'week': week.data,
@@ -225,6 +242,47 @@ def get_week_rankings(week_id):
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/session-leaderboard/<session_id>', methods=['GET'])
+@cached_public_response(lambda session_id: publish_versions.epoch())
+def get_session_leaderboard(session_id):
+    # cumulative standings, kept current by database triggers
+    try:
+        response = supabase.table('session_leaderboard')\
+            .select('*, students(full_name, grade)')\
+            .eq('session_id', session_id)\
+            .order('total_score', desc=True)\
+            .execute()
+        
+        # dense rank on total score
+        standings = []
+        rank = 0
+        previous_total = None
+        for row in response.data:
+            if row['total_score'] != previous_total:
+                rank += 1
+                previous_total = row['total_score']
+            
+            student = row.get('students') or {}
+            standings.append({
+                'rank': rank,
+                'student_id': row['student_id'],
+                'student_name': student.get('full_name', 'Unknown'),
+                'grade': student.get('grade'),
+                'total_score': row['total_score'],
+                'scores_count': row['scores_count'],
+                'weeks_participated': row['weeks_participated'],
+                'wins': row['wins'],
+                'first_places': row['first_places'],
+                'best_position': row['best_position'],
+                'average_position': row['average_position']
+            })
+        
+        return jsonify({'session_id': session_id, 'standings': standings}), 200
+        
+    except Exception as e:
+        print(f"Error in get_session_leaderboard: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/weeks-by-event/<event_id>', methods=['GET'])
 @require_auth
 def get_weeks_by_event(event_id):
@@ -2,6 +2,11 @@ from flask import Blueprint, request, jsonify
 from supabase import create_client
 from config import Config
 from functools import wraps
+from utils.auth import get_current_identity
+from utils.http_cache import bump_publish_version
+from utils.fanout import fan_out
+from utils.ttl_cache import TTLCache
+from utils.cursors import InvalidCursor, parse_cursor, parse_limit
 
 bp = Blueprint('judge', __name__, url_prefix='/judge')
 
@@ -10,6 +15,9 @@ bp = Blueprint('judge', __name__, url_prefix='/judge')
 # init supabase
 supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
 
+# a participant never changes week, so scoring skips the lookup once it's known
+_participant_weeks = TTLCache(Config.PARTICIPANT_WEEK_CACHE_TTL)
+
 def require_judge(f):
     # decorator to require judge auth
     @wraps(f)
@@ -20,14 +28,13 @@ def require_judge(f):
             if not auth_header.startswith('Bearer '):
                 return jsonify({'error': 'No authorization token'}), 401
             
-            token = auth_header[7:]
             # verify the token
-            user = supabase.auth.get_user(token)
-            if not user or not user.user:
+            identity = get_current_identity()
+            if not identity:
                 return jsonify({'error': 'Invalid token'}), 401
             
             # attach user to request
-            request.current_user = user.user
+            request.current_user = identity.user
             return f(*args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Authentication failed', 'details': str(e)}), 401
@@ -36,12 +43,9 @@ def require_judge(f):
 def get_judge_email_from_request():
     # get judge email from request
     try:
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
-            user = supabase.auth.get_user(token)
-            if user and user.user:
-                return user.user.email, user.user.id
+        identity = get_current_identity()
+        if identity:
+            return identity.email, identity.user_id
         return None, None
     except Exception as e:
         print(f"Error getting judge email: {e}")
@@ -53,24 +57,18 @@ def get_judge_email_from_request():
 def get_my_assignments():
     # get active assignments for the current user
     try:
-        judge_email, judge_id = get_judge_email_from_request()
-        print(f"Judge email check: {judge_email}")
+        identity = get_current_identity()
         
-        if not judge_email:
+        if not identity or not identity.email:
             print("No judge email found, returning empty assignments")
             return jsonify({'assignments': []}), 200
         
         # get active permissions
-        response = supabase.table('judge_permissions')\
-            .select('*, weeks(id, week_number, topic, session_id, sessions(events(name)))')\
-            .eq('user_email', judge_email)\
-            .eq('is_active', True)\
-            .execute()
+        assignments = identity.judge_permissions
         
-        print(f"Found {len(response.data)} active assignments for {judge_email}")
-        print(f"Assignments: {response.data}")
+        print(f"Found {len(assignments)} active assignments for {identity.email}")
         
-        return jsonify({'assignments': response.data}), 200
+        return jsonify({'assignments': assignments}), 200
     except Exception as e:
         print(f"Error in get_my_assignments: {e}")
         import traceback
@@ -90,45 +88,119 @@ def get_week_participants(week_id):
             return jsonify({'error': 'Could not identify judge'}), 401
         
         # verify permission
-        permission = supabase.table('judge_permissions')\
-            .select('*')\
-            .eq('user_email', judge_email)\
-            .eq('week_id', week_id)\
-            .eq('is_active', True)\
-            .execute()
+        permissions = get_current_identity().permissions_for_week(week_id)
         
-        if not permission.data:
+        if not permissions:
             return jsonify({'error': 'No permission to score this week'}), 403
         
-        judge_type = permission.data[0]['judge_type']
+        judge_type = permissions[0]['judge_type']
         
-        # get all participants
-        participants_response = supabase.table('participants')\
-            .select('*, students(full_name, grade)')\
-            .eq('week_id', week_id)\
-            .execute()
-        
-        # get existing scores
-        participant_ids = [p['id'] for p in participants_response.data]
-        scores_response = supabase.table('judge_scores')\
-            .select('*')\
-            .eq('judge_email', judge_email)\
-            .eq('judge_type', judge_type)\
-            .in_('participant_id', participant_ids)\
-            .execute()
+        # participants and this judge's scores for the week, together
+        outcome = fan_out({
+            'participants': lambda: supabase.table('participants')\
+                .select('*, students(full_name, grade)')\
+                .eq('week_id', week_id)\
+                .execute().data,
+            'scores': lambda: supabase.table('judge_scores')\
+                .select('participant_id, participants!inner(week_id)')\
+                .eq('judge_email', judge_email)\
+                .eq('judge_type', judge_type)\
+                .eq('participants.week_id', week_id)\
+                .execute().data
+        })
+        
+        if not outcome.ok:
+            return jsonify({'error': 'Failed to load participants', 'details': outcome.errors}), 500
+        
+        participants = outcome.get('participants')
+        for participant in participants:
+            _participant_weeks.set(participant['id'], week_id)
         
         # mark scored status
-        scored_participant_ids = {s['participant_id'] for s in scores_response.data}
-        for participant in participants_response.data:
+        scored_participant_ids = {s['participant_id'] for s in outcome.get('scores')}
+        for participant in participants:
             participant['scored'] = participant['id'] in scored_participant_ids
         
         return jsonify({
-            'participants': participants_response.data,
+            'participants': participants,
             'judge_type': judge_type
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/api/bootstrap', methods=['GET'])
+@require_judge
+def get_scoring_bootstrap():
+    # everything the scoring page needs in one response
+    # without week_id only assignments are returned
+    try:
+        identity = get_current_identity()
+        judge_email = identity.email
+        if not judge_email:
+            return jsonify({'error': 'Could not identify judge'}), 401
+        
+        # served from the permission index, not a query per request
+        assignments = identity.judge_permissions
+        
+        week_id = request.args.get('week_id')
+        if not week_id:
+            return jsonify({'assignments': assignments, 'week': None}), 200
+        
+        permissions = identity.permissions_for_week(week_id, request.args.get('judge_type'))
+        if not permissions:
+            return jsonify({'error': 'No permission to score this week'}), 403
+        
+        judge_type = permissions[0]['judge_type']
+        
+        outcome = fan_out({
+            'participants': lambda: supabase.table('participants')\
+                .select('*, students(full_name, grade)')\
+                .eq('week_id', week_id)\
+                .execute().data,
+            'criteria': lambda: supabase.table('judging_criteria')\
+                .select('*')\
+                .eq('category', judge_type)\
+                .order('id')\
+                .execute().data,
+            # this judge's saved scores, used to prefill the score form
+            'scores': lambda: supabase.table('judge_scores')\
+                .select('*, participants!inner(week_id)')\
+                .eq('judge_email', judge_email)\
+                .eq('judge_type', judge_type)\
+                .eq('participants.week_id', week_id)\
+                .execute().data
+        })
+        
+        if not outcome.ok:
+            return jsonify({'error': 'Failed to load scoring data', 'details': outcome.errors}), 500
+        
+        scores = outcome.get('scores')
+        for score in scores:
+            score.pop('participants', None)
+        
+        scored_participant_ids = {s['participant_id'] for s in scores}
+        participants = outcome.get('participants')
+        for participant in participants:
+            participant['scored'] = participant['id'] in scored_participant_ids
+            _participant_weeks.set(participant['id'], week_id)
+        
+        week = permissions[0].get('weeks') or {}
+        
+        return jsonify({
+            'assignments': assignments,
+            'week': {
+                'id': week_id,
+                'week_number': week.get('week_number'),
+                'topic': week.get('topic')
+            },
+            'judge_type': judge_type,
+            'participants': participants,
+            'criteria': outcome.get('criteria'),
+            'scores': scores
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/api/criteria', methods=['GET'])
 @require_judge
 def get_judging_criteria():
@@ -147,6 +219,54 @@ def get_judging_criteria():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+MAX_BATCH_SCORES = 100
+MAX_MY_SCORES_PAGE = 500
+SCORE_CONFLICT_KEY = 'participant_id,judge_email,judge_type'
+
+def _participant_week_ids(participant_ids):
+    # participant id -> week id, one query for whatever isn't cached
+    week_ids = {}
+    missing = []
+    for participant_id in participant_ids:
+        week_id = _participant_weeks.get(participant_id)
+        if week_id:
+            week_ids[participant_id] = week_id
+        else:
+            missing.append(participant_id)
+    
+    if missing:
+        response = supabase.table('participants')\
+            .select('id, week_id')\
+            .in_('id', missing)\
+            .execute()
+        for row in response.data:
+            _participant_weeks.set(row['id'], row['week_id'])
+            week_ids[row['id']] = row['week_id']
+    
+    return week_ids
+
+def _build_score(item, judge_email, identity, week_ids):
+    # returns (score_data, week_id, error, status)
+    if not item.get('participant_id') or not item.get('judge_type'):
+        return None, None, 'Participant ID and judge type are required', 400
+    
+    week_id = week_ids.get(item['participant_id'])
+    if not week_id:
+        return None, None, 'Participant not found', 404
+    
+    if not identity.permissions_for_week(week_id, item['judge_type']):
+        return None, week_id, 'No permission to score this participant', 403
+    
+    return {
+        'participant_id': item['participant_id'],
+        'judge_email': judge_email,
+        'judge_type': item['judge_type'],
+        'score': item.get('score', 0),
+        'max_score': item.get('max_score', 100),
+        'comments': item.get('comments', ''),
+        'criteria_breakdown': item.get('criteria_breakdown', {})
+    }, week_id, None, 200
+
 @bp.route('/api/submit-score', methods=['POST'])
 @require_judge
 def submit_score():
@@ -158,59 +278,19 @@ def submit_score():
         if not judge_email:
             return jsonify({'error': 'Could not identify judge'}), 401
         
-        if not data.get('participant_id') or not data.get('judge_type'):
-            return jsonify({'error': 'Participant ID and judge type are required'}), 400
+        week_ids = _participant_week_ids([data['participant_id']]) if data.get('participant_id') else {}
+        score_data, week_id, error, status = _build_score(data, judge_email, get_current_identity(), week_ids)
         
-        # verify judge has permission
-        participant = supabase.table('participants')\
-            .select('week_id')\
-            .eq('id', data['participant_id'])\
-            .single()\
-            .execute()
+        if error:
+            return jsonify({'error': error}), status
         
-        if not participant.data:
-            return jsonify({'error': 'Participant not found'}), 404
-        
-        permission = supabase.table('judge_permissions')\
-            .select('*')\
-            .eq('user_email', judge_email)\
-            .eq('week_id', participant.data['week_id'])\
-            .eq('judge_type', data['judge_type'])\
-            .eq('is_active', True)\
+        # insert or overwrite this judge's score in one statement
+        response = supabase.table('judge_scores')\
+            .upsert(score_data, on_conflict=SCORE_CONFLICT_KEY)\
             .execute()
         
-        if not permission.data:
-            return jsonify({'error': 'No permission to score this participant'}), 403
-        
-        # check if already scored
-        existing_score = supabase.table('judge_scores')\
-            .select('*')\
-            .eq('participant_id', data['participant_id'])\
-            .eq('judge_email', judge_email)\
-            .eq('judge_type', data['judge_type'])\
-            .execute()
-        
-        score_data = {
-            'participant_id': data['participant_id'],
-            'judge_email': judge_email,
-            'judge_type': data['judge_type'],
-            'score': data.get('score', 0),
-            'max_score': data.get('max_score', 100),
-            'comments': data.get('comments', ''),
-            'criteria_breakdown': data.get('criteria_breakdown', {})
-        }
-        
-        if existing_score.data:
-            # update existing
-            response = supabase.table('judge_scores')\
-                .update(score_data)\
-                .eq('id', existing_score.data[0]['id'])\
-                .execute()
-        else:
-            # insert new
-            response = supabase.table('judge_scores')\
-                .insert(score_data)\
-                .execute()
+        # rankings show live totals
+        bump_publish_version(week_id)
         
         return jsonify({
             'message': 'Score submitted successfully',
@@ -219,71 +299,127 @@ def submit_score():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/api/submit-scores', methods=['POST'])
+@require_judge
+def submit_scores():
+    # submit several scores at once, each item reported separately
+    try:
+        data = request.json
+        judge_email, judge_id = get_judge_email_from_request()
+        
+        if not judge_email:
+            return jsonify({'error': 'Could not identify judge'}), 401
+        
+        items = data.get('scores') or []
+        if not items:
+            return jsonify({'error': 'Scores are required'}), 400
+        if len(items) > MAX_BATCH_SCORES:
+            return jsonify({'error': f'At most {MAX_BATCH_SCORES} scores per request'}), 400
+        
+        identity = get_current_identity()
+        week_ids = _participant_week_ids({i['participant_id'] for i in items if i.get('participant_id')})
+        
+        results = []
+        # one row per conflict key, a later item for the same participant wins
+        pending = {}
+        for index, item in enumerate(items):
+            score_data, week_id, error, status = _build_score(item, judge_email, identity, week_ids)
+            result = {
+                'index': index,
+                'participant_id': item.get('participant_id'),
+                'judge_type': item.get('judge_type'),
+                'success': error is None,
+                'error': error,
+                'status': status
+            }
+            results.append(result)
+            if score_data:
+                key = (score_data['participant_id'], score_data['judge_type'])
+                if key in pending:
+                    superseded = pending[key][2]
+                    superseded.update(success=False, error='Superseded by a later item', status=409)
+                pending[key] = (score_data, week_id, result)
+        
+        if pending:
+            try:
+                response = supabase.table('judge_scores')\
+                    .upsert([score for score, _, _ in pending.values()], on_conflict=SCORE_CONFLICT_KEY)\
+                    .execute()
+                saved = {(s['participant_id'], s['judge_type']): s for s in response.data}
+                for key, (_, _, result) in pending.items():
+                    result['score'] = saved.get(key)
+            except Exception as e:
+                # the upsert is one statement, so none of the batch was saved
+                for _, _, result in pending.values():
+                    result.update(success=False, error=str(e), status=500)
+            
+            for week_id in {week_id for _, week_id, result in pending.values() if result['success']}:
+                bump_publish_version(week_id)
+        
+        submitted = sum(1 for r in results if r['success'])
+        return jsonify({
+            'results': results,
+            'submitted': submitted,
+            'failed': len(results) - submitted
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/api/my-scores', methods=['GET'])
 def get_my_scores():
-    # get all scores by current judge
+    # get scores by current judge, newest first, with student and week embedded
     try:
         judge_email, judge_id = get_judge_email_from_request()
         if not judge_email:
-            return jsonify({'scores': []}), 200
+            return jsonify({'scores': [], 'next_cursor': None}), 200
         
-        week_id = request.args.get('week_id')
+        limit = parse_limit(request.args.get('limit'), 200, MAX_MY_SCORES_PAGE)
         
         query = supabase.table('judge_scores')\
-            .select('*')\
-            .eq('judge_email', judge_email)
+            .select('*, participants!inner(id, week_id, students(full_name, grade), weeks(week_number, topic))')\
+            .eq('judge_email', judge_email)\
+            .order('judged_at', desc=True)\
+            .order('id', desc=True)\
+            .limit(limit + 1)
         
+        week_id = request.args.get('week_id')
         if week_id:
-            # filter to only participants from this specific week
-            participants = supabase.table('participants')\
-                .select('id')\
-                .eq('week_id', week_id)\
-                .execute()
-            participant_ids = [p['id'] for p in participants.data]
-            if not participant_ids:
-                return jsonify({'scores': []}), 200
-            query = query.in_('participant_id', participant_ids)
-        
-        response = query.execute()
-        
-        print(f"Found {len(response.data)} scores for judge {judge_email}")
+            # filtered through the join, no participant-id prefetch
+            query = query.eq('participants.week_id', week_id)
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            # keyset on (judged_at, id)
+            judged_at, score_id = parse_cursor(cursor, 'timestamp', 'uuid')
+            query = query.or_(
+                f'judged_at.lt."{judged_at}",'
+                f'and(judged_at.eq."{judged_at}",id.lt.{score_id})'
+            )
+        
+        rows = query.execute().data
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        print(f"Found {len(rows)} scores for judge {judge_email}")
+        
+        # same shape as before: participant.student and participant.week
+        for score in rows:
+            participant = score.pop('participants', None) or {}
+            student = participant.get('students') or {}
+            score['participant'] = {
+                'student': {
+                    'name': student.get('full_name', 'Unknown'),
+                    'roll_number': student.get('roll_number', 'N/A')
+                },
+                'week': participant.get('weeks') or {}
+            }
         
-        # enrich with details
-        for score in response.data:
-            try:
-                participant = supabase.table('participants')\
-                    .select('id, student_id, week_id')\
-                    .eq('id', score['participant_id'])\
-                    .single()\
-                    .execute()
-                
-                if participant.data:
-                    # get student info
-                    student = supabase.table('students')\
-                        .select('*')\
-                        .eq('id', participant.data['student_id'])\
-                        .single()\
-                        .execute()
-                    
-                    # get week info
-                    week = supabase.table('weeks')\
-                        .select('week_number, topic')\
-                        .eq('id', participant.data['week_id'])\
-                        .single()\
-                        .execute()
-                    
-                    score['participant'] = {
-                        'student': {
-                            'name': student.data.get('name') or student.data.get('full_name', 'Unknown'),
-                            'roll_number': student.data.get('roll_number', 'N/A')
-                        },
-                        'week': week.data if week.data else {}
-                    }
-            except Exception as e:
-                print(f"Error enriching score {score.get('id')}: {e}")
-                score['participant'] = None
-        
-        return jsonify({'scores': response.data}), 200
+        return jsonify({
+            'scores': rows,
+            'next_cursor': f"{rows[-1]['judged_at']}|{rows[-1]['id']}" if has_more else None
+        }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_my_scores: {e}")
         import traceback
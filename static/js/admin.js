@@ -101,6 +101,43 @@ class AdminPanel {
         }
     }
     
+    async updateStudents(changes) {
+        // changes: [{id, grade?, is_active?, email?}], applied in one request
+        try {
+            const response = await fetch('/admin/api/students/batch', {
+                method: 'PATCH',
+                headers: auth.getAuthHeaders(),
+                body: JSON.stringify({ students: changes })
+            });
+            
+            if (!response.ok) throw new Error('Failed to update students');
+            
+            const data = await response.json();
+            return data.students;
+        } catch (error) {
+            console.error('Error updating students:', error);
+            throw error;
+        }
+    }
+    
+    async deleteStudents(studentIds) {
+        try {
+            const response = await fetch('/admin/api/students/batch', {
+                method: 'DELETE',
+                headers: auth.getAuthHeaders(),
+                body: JSON.stringify({ student_ids: studentIds })
+            });
+            
+            if (!response.ok) throw new Error('Failed to delete students');
+            
+            const data = await response.json();
+            return data.deleted;
+        } catch (error) {
+            console.error('Error deleting students:', error);
+            throw error;
+        }
+    }
+    
     async importCSV(csvContent) {
         try {
             const response = await fetch('/admin/api/import-csv', {
@@ -119,6 +156,28 @@ class AdminPanel {
         }
     }
     
+    async uploadCSV(file) {
+        try {
+            const formData = new FormData();
+            formData.append('file', file);
+            
+            // let the browser set the multipart content type
+            const response = await fetch('/admin/api/import-csv/upload', {
+                method: 'POST',
+                headers: { 'Authorization': auth.getAuthHeaders()['Authorization'] },
+                body: formData
+            });
+            
+            if (!response.ok) throw new Error('Failed to import CSV');
+            
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error importing CSV:', error);
+            throw error;
+        }
+    }
+    
     // sessions
     
     async loadSessions() {
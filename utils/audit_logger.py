@@ -1,15 +1,188 @@
 # audit logging for admin actions
+# entries are queued and written in batches by a background thread, so admin
+# writes don't wait on a second insert. batches that can't be written go to an
+# append-only jsonl spool and are replayed once supabase is reachable again.
+# rows the database itself rejects go to a separate dead-letter file instead
 from supabase import create_client
+from postgrest.exceptions import APIError
 from config import Config
 from flask import request
+from datetime import datetime, timezone
+import atexit
 import json
+import os
+import queue
+import threading
+import time
 
 supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
 
+def _is_rejected_row(error):
+    # postgres data exceptions (22xxx) and constraint violations (23xxx) come from
+    # the row itself, retrying it later can't help
+    code = str(getattr(error, 'code', '') or '')
+    return isinstance(error, APIError) and code[:2] in ('22', '23')
+
+class AuditWriter:
+    
+    def __init__(self, insert, flush_size, flush_interval, spool_path, dead_letter_path):
+        self._insert = insert
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        # past this, entries skip the queue and go straight to the spool
+        self._queue = queue.Queue(maxsize=self.flush_size * 100)
+        self._spool_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # after a failed replay, wait this long before reading the spool again
+        self._replay_backoff = max(30.0, flush_interval)
+        self._next_replay = 0.0
+    
+    def enqueue(self, entry):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._spool([entry])
+    
+    def _ensure_started(self):
+        # started on first use so forked workers each get their own thread
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        
+        while not self._stop.is_set():
+            try:
+                batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            
+            if len(batch) >= self.flush_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                self.replay_spool()
+                deadline = time.monotonic() + self.flush_interval
+        
+        # write what was picked up before stopping, close() drains the rest
+        self._write(batch)
+    
+    def _drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                return entries
+    
+    def _write(self, entries):
+        # insert in flush_size batches; anything that fails to reach the database is spooled
+        with self._flush_lock:
+            for start in range(0, len(entries), self.flush_size):
+                batch = entries[start:start + self.flush_size]
+                try:
+                    self._insert(batch)
+                except Exception as e:
+                    if _is_rejected_row(e):
+                        if self._write_rows(batch):
+                            continue
+                        # lost the database partway, the rest of this batch is already spooled
+                        self._spool(entries[start + len(batch):])
+                        return False
+                    print(f"Error writing audit entries, spooling {len(entries) - start}: {e}")
+                    self._spool(entries[start:])
+                    return False
+        return True
+    
+    def _write_rows(self, batch):
+        # one bad row fails the whole insert, so retry the batch a row at a time
+        # returns False if the database became unreachable partway through
+        for index, entry in enumerate(batch):
+            try:
+                self._insert([entry])
+            except Exception as e:
+                if not _is_rejected_row(e):
+                    print(f"Error writing audit entries, spooling {len(batch) - index}: {e}")
+                    self._spool(batch[index:])
+                    return False
+                print(f"Audit entry rejected by the database, dead-lettering: {e}")
+                self._spool([{'entry': entry, 'error': str(e)}], self.dead_letter_path)
+        return True
+    
+    def _spool(self, entries, path=None):
+        if not entries:
+            return
+        try:
+            with self._spool_lock:
+                with open(path or self.spool_path, 'a', encoding='utf-8') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + '\n')
+        except Exception as e:
+            print(f"Error spooling {len(entries)} audit entries: {e}")
+    
+    def replay_spool(self):
+        if time.monotonic() < self._next_replay:
+            return
+        
+        # move the spool aside first so new failures append to a fresh file
+        replay_path = f"{self.spool_path}.{os.getpid()}.replay"
+        with self._spool_lock:
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.spool_path, replay_path)
+                except FileNotFoundError:
+                    return
+        
+        try:
+            with open(replay_path, encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            print(f"Error reading audit spool: {e}")
+            return
+        
+        # failed entries are re-spooled by _write, so the replay file can go either way
+        if not self._write(entries):
+            self._next_replay = time.monotonic() + self._replay_backoff
+        os.remove(replay_path)
+    
+    def flush(self):
+        # write everything queued so far on the calling thread
+        self._write(self._drain())
+    
+    def close(self, timeout=5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+def _insert_entries(entries):
+    supabase.table('audit_logs').insert(entries).execute()
+
+audit_writer = AuditWriter(
+    _insert_entries,
+    flush_size=Config.AUDIT_FLUSH_SIZE,
+    flush_interval=Config.AUDIT_FLUSH_INTERVAL,
+    spool_path=Config.AUDIT_SPOOL_PATH,
+    dead_letter_path=Config.AUDIT_DEAD_LETTER_PATH
+)
+atexit.register(audit_writer.close)
+
 class AuditLogger:
     
     @staticmethod
-    def log_action(admin_email, admin_id, action_type, entity_type, entity_id=None, 
+    def log_action(admin_email, admin_id, action_type, entity_type, entity_id=None,
                    entity_name=None, old_value=None, new_value=None, description=None):
         try:
             log_entry = {
@@ -21,10 +194,12 @@ class AuditLogger:
                 'entity_name': entity_name,
                 'old_value': json.dumps(old_value) if old_value else None,
                 'new_value': json.dumps(new_value) if new_value else None,
-                'description': description
+                'description': description,
+                # stamped now, the row may be written seconds (or an outage) later
+                'created_at': datetime.now(timezone.utc).isoformat()
             }
             
-            supabase.table('audit_logs').insert(log_entry).execute()
+            audit_writer.enqueue(log_entry)
         except Exception as e:
             print(f"Error logging audit entry: {e}")
             # don't fail main if logging fails
@@ -0,0 +1,163 @@
+# audit log retention
+# monthly audit_logs partitions older than AUDIT_RETENTION_MONTHS are exported to
+# gzipped jsonl under AUDIT_ARCHIVE_DIR and then dropped, so the live table and
+# its indexes only ever hold the retention window
+#
+# run it on a schedule (e.g. daily):
+#   python -m utils.audit_retention [--dry-run] [--retention-months N] [--archive-dir DIR]
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from supabase import create_client
+from config import Config
+
+EXPORT_PAGE = 1000
+DEFAULT_PARTITION = 'audit_logs_default'
+
+def retention_cutoff(months, now=None):
+    # start of the month `months` months before the current one
+    now = now or datetime.now(timezone.utc)
+    month_index = now.year * 12 + (now.month - 1) - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _export_rows(client, table, path, before=None):
+    # oldest first, keyset on (created_at, id); written to a temp file and
+    # renamed so a half-written archive never looks complete
+    tmp_path = f"{path}.tmp"
+    exported = 0
+    cursor = None
+    
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        while True:
+            query = client.table(table)\
+                .select('*')\
+                .order('created_at')\
+                .order('id')\
+                .limit(EXPORT_PAGE)
+            if before:
+                query = query.lt('created_at', before.isoformat())
+            if cursor:
+                created_at, log_id = cursor
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.gt.{log_id})'
+                )
+            
+            rows = query.execute().data
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+            exported += len(rows)
+            
+            if len(rows) < EXPORT_PAGE:
+                break
+            cursor = (rows[-1]['created_at'], rows[-1]['id'])
+    
+    os.replace(tmp_path, path)
+    return exported
+
+def _count_rows(client, table, before=None):
+    query = client.table(table).select('id', count='exact').limit(1)
+    if before:
+        query = query.lt('created_at', before.isoformat())
+    return query.execute().count
+
+def archive_partition(client, partition, archive_dir, dry_run=False):
+    name = partition['partition_name']
+    path = os.path.join(archive_dir, f"{name}.jsonl.gz")
+    result = {'partition': name, 'archive': path, 'rows': _count_rows(client, name), 'dropped': False}
+    
+    if dry_run:
+        return result
+    
+    exported = _export_rows(client, name, path)
+    if exported != _count_rows(client, name):
+        # something wrote into an old month while exporting, try again next run
+        result['error'] = f"exported {exported} rows but the partition changed, not dropping"
+        return result
+    
+    client.rpc('drop_audit_log_partition', {'p_partition_name': name}).execute()
+    result.update(rows=exported, dropped=True)
+    return result
+
+def archive_default_partition(client, cutoff, archive_dir, dry_run=False):
+    # old rows that landed in the default partition are exported and deleted instead
+    count = _count_rows(client, DEFAULT_PARTITION, before=cutoff)
+    path = os.path.join(archive_dir, f"{DEFAULT_PARTITION}_before_{cutoff:%Y_%m}.jsonl.gz")
+    result = {'partition': DEFAULT_PARTITION, 'archive': path, 'rows': count, 'dropped': False}
+    
+    if dry_run or not count:
+        return result
+    
+    exported = _export_rows(client, DEFAULT_PARTITION, path, before=cutoff)
+    if exported != _count_rows(client, DEFAULT_PARTITION, before=cutoff):
+        result['error'] = f"exported {exported} rows but the partition changed, not deleting"
+        return result
+    
+    client.table(DEFAULT_PARTITION).delete().lt('created_at', cutoff.isoformat()).execute()
+    result.update(rows=exported, dropped=True)
+    return result
+
+def run(retention_months=None, archive_dir=None, dry_run=False, client=None):
+    retention_months = Config.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    archive_dir = archive_dir or Config.AUDIT_ARCHIVE_DIR
+    client = client or create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+    
+    cutoff = retention_cutoff(retention_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    
+    results = []
+    
+    # keep partitions ahead of the clock so new rows don't fall into the default
+    # a failure here is reported, archiving old partitions doesn't depend on it
+    if not dry_run:
+        try:
+            client.rpc('ensure_audit_log_partitions', {'p_months_ahead': 3}).execute()
+        except Exception as e:
+            results.append({'partition': 'upcoming partitions', 'error': str(e), 'dropped': False})
+    
+    partitions = client.rpc('list_audit_log_partitions', {}).execute().data
+    
+    for partition in partitions:
+        # a partition goes once its whole month is older than the cutoff
+        if _parse_timestamp(partition['range_end']) > cutoff:
+            continue
+        try:
+            results.append(archive_partition(client, partition, archive_dir, dry_run))
+        except Exception as e:
+            results.append({'partition': partition['partition_name'], 'error': str(e), 'dropped': False})
+    
+    try:
+        results.append(archive_default_partition(client, cutoff, archive_dir, dry_run))
+    except Exception as e:
+        results.append({'partition': DEFAULT_PARTITION, 'error': str(e), 'dropped': False})
+    
+    return cutoff, results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive and drop audit_logs partitions older than the retention window')
+    parser.add_argument('--retention-months', type=int, default=None,
+                        help=f'months of audit logs to keep (default {Config.AUDIT_RETENTION_MONTHS})')
+    parser.add_argument('--archive-dir', default=None,
+                        help=f'where archives are written (default {Config.AUDIT_ARCHIVE_DIR})')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be archived without changing anything')
+    args = parser.parse_args(argv)
+    
+    cutoff, results = run(args.retention_months, args.archive_dir, args.dry_run)
+    
+    print(f"Archiving audit logs before {cutoff:%Y-%m-%d}{' (dry run)' if args.dry_run else ''}")
+    for result in results:
+        if result.get('error'):
+            print(f"  {result['partition']}: {result['error']}")
+        else:
+            action = 'archived and removed' if result['dropped'] else 'would archive' if args.dry_run else 'nothing to archive'
+            print(f"  {result['partition']}: {result['rows']} rows, {action} -> {result['archive']}")
+    
+    return 1 if any(r.get('error') for r in results) else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
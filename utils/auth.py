@@ -1,14 +1,74 @@
 from functools import wraps
-from flask import request, jsonify, redirect
+from flask import request, jsonify, redirect, g, has_request_context
 from supabase import create_client
 from config import Config
+from utils.ttl_cache import TTLCache
+from utils.judge_permissions import judge_permission_index
 import jwt
+import time
 
 # init supabase
 supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
 supabase_admin = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
 
-def get_user_from_token(token):
+_jwks_client = None
+
+# user_id -> is admin, both answers are cached
+_admin_cache = TTLCache(Config.ADMIN_CACHE_TTL)
+
+class TokenUser:
+    # stand-in for the supabase user object, built from verified claims
+    def __init__(self, claims):
+        self.id = claims.get('sub')
+        self.email = claims.get('email')
+        self.role = claims.get('role')
+        self.app_metadata = claims.get('app_metadata') or {}
+        self.user_metadata = claims.get('user_metadata') or {}
+        self.claims = claims
+
+def _get_jwks_client():
+    global _jwks_client
+    if _jwks_client is None:
+        # keys are cached and refetched once when an unknown kid shows up
+        _jwks_client = jwt.PyJWKClient(
+            f"{Config.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+            cache_keys=True,
+            lifespan=Config.JWKS_CACHE_TTL
+        )
+    return _jwks_client
+
+def _decode_token_locally(token):
+    # returns verified claims, or None if the token can't be checked locally
+    # raises jwt.InvalidTokenError for bad or expired tokens
+    alg = jwt.get_unverified_header(token).get('alg')
+    
+    if alg == 'HS256':
+        if not Config.SUPABASE_JWT_SECRET:
+            return None
+        key = Config.SUPABASE_JWT_SECRET
+    elif alg in ('RS256', 'ES256') and Config.SUPABASE_URL:
+        try:
+            key = _get_jwks_client().get_signing_key_from_jwt(token).key
+        except (jwt.PyJWKClientError, jwt.PyJWKError, jwt.PyJWKSetError) as e:
+            # key rotated away, jwks unreachable, or no usable keys (e.g. cryptography missing)
+            print(f"JWKS lookup failed, using auth server: {e}")
+            return None
+    else:
+        return None
+    
+    try:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience='authenticated',
+            options={'require': ['exp', 'sub']}
+        )
+    except jwt.InvalidAlgorithmError:
+        # asymmetric algs need the cryptography package
+        return None
+
+def _get_user_from_auth_server(token):
     try:
         user = supabase.auth.get_user(token)
         return user.user if user else None
@@ -16,24 +76,78 @@ def get_user_from_token(token):
         print(f"Token verification error: {e}")
         return None
 
+def get_user_from_token(token):
+    try:
+        claims = _decode_token_locally(token)
+    except jwt.InvalidTokenError as e:
+        print(f"Token verification error: {e}")
+        return None
+    
+    # near expiry the auth server has the final say
+    if claims and claims['exp'] - time.time() > Config.JWT_EXPIRY_MARGIN:
+        return TokenUser(claims)
+    
+    return _get_user_from_auth_server(token)
+
+class RequestIdentity:
+    # who is calling, resolved once per request and kept on flask.g
+    def __init__(self, user):
+        self.user = user
+        self.user_id = user.id
+        self.email = user.email
+        self._is_admin = None
+    
+    @property
+    def is_admin(self):
+        # raises if the admins table can't be read
+        if self._is_admin is None:
+            self._is_admin = _lookup_admin(self.user_id)
+        return self._is_admin
+    
+    @property
+    def judge_permissions(self):
+        # active judge permissions for this user
+        return judge_permission_index.for_email(self.email)
+    
+    def permissions_for_week(self, week_id, judge_type=None):
+        if judge_type is not None:
+            permission = judge_permission_index.get(self.email, week_id, judge_type)
+            return [permission] if permission else []
+        return judge_permission_index.for_email(self.email, week_id)
+
+def get_request_token(allow_cookie=False):
+    token = request.headers.get('Authorization')
+    
+    if token:
+        return token[7:] if token.startswith('Bearer ') else token
+    
+    if allow_cookie:
+        return request.cookies.get('access_token')
+    
+    return None
+
+def get_current_identity(allow_cookie=False):
+    # verify the token at most once per request
+    if 'identity' not in g:
+        token = get_request_token(allow_cookie)
+        user = get_user_from_token(token) if token else None
+        g.identity = RequestIdentity(user) if user else None
+    
+    return g.identity
+
 def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
+        if not get_request_token():
             return jsonify({'error': 'No authorization token provided'}), 401
         
-        if token.startswith('Bearer '):
-            token = token[7:]
+        identity = get_current_identity()
         
-        user = get_user_from_token(token)
-        
-        if not user:
+        if not identity:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
         # attach user to request
-        request.user = user
+        request.user = identity.user
         return f(*args, **kwargs)
     
     return decorated_function
@@ -41,39 +155,30 @@ def require_auth(f):
 def require_admin(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if token and token.startswith('Bearer '):
-            token = token[7:]
-        elif not token:
-            # fall back to cookie
-            token = request.cookies.get('access_token')
-        
         # html request check
         is_html_request = 'text/html' in request.headers.get('Accept', '')
         
-        if not token:
+        # fall back to cookie for page loads
+        if not get_request_token(allow_cookie=True):
             if is_html_request:
                 return redirect('/')
             return jsonify({'error': 'No authorization token provided'}), 401
         
-        user = get_user_from_token(token)
+        identity = get_current_identity(allow_cookie=True)
         
-        if not user:
+        if not identity:
             if is_html_request:
                 return redirect('/')
             return jsonify({'error': 'Invalid or expired token'}), 401
         
         # check admin table
         try:
-            result = supabase_admin.table('admins').select('*').eq('user_id', user.id).execute()
-            
-            if not result.data or len(result.data) == 0:
+            if not identity.is_admin:
                 if is_html_request:
                     return redirect('/')
                 return jsonify({'error': 'Unauthorized. Admin access required.'}), 403
             
-            request.user = user
+            request.user = identity.user
             request.is_admin = True
             return f(*args, **kwargs)
             
@@ -85,10 +190,40 @@ def require_admin(f):
     
     return decorated_function
 
+def _lookup_admin(user_id):
+    # ADMIN_CACHE_TTL=0 turns the cache off for both answers
+    caching = Config.ADMIN_CACHE_TTL > 0
+    
+    cached = _admin_cache.get(user_id) if caching else None
+    if cached is not None:
+        return cached
+    
+    result = supabase_admin.table('admins')\
+        .select('user_id')\
+        .eq('user_id', user_id)\
+        .limit(1)\
+        .execute()
+    
+    is_admin = bool(result.data)
+    if caching:
+        _admin_cache.set(user_id, is_admin, ttl=None if is_admin else Config.ADMIN_NEGATIVE_CACHE_TTL)
+    return is_admin
+
+def invalidate_admin_cache(user_id=None):
+    # call after changing the admins table
+    if user_id is None:
+        _admin_cache.clear()
+    else:
+        _admin_cache.invalidate(user_id)
+
 def is_user_admin(user_id):
+    # reuse the request identity when it is the same user
+    identity = g.get('identity') if has_request_context() else None
+    
     try:
-        result = supabase_admin.table('admins').select('*').eq('user_id', user_id).execute()
-        return result.data and len(result.data) > 0
+        if identity and identity.user_id == user_id:
+            return identity.is_admin
+        return _lookup_admin(user_id)
     except Exception as e:
         print(f"Admin check error: {e}")
         return False
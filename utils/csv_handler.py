@@ -1,62 +1,71 @@
 import csv
 import io
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 class CSVStudentImporter:
     
     @staticmethod
-    def parse_csv(file_content: str) -> Tuple[List[Dict], List[str]]:
-        students = []
-        errors = []
+    def iter_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+        # yields (line_number, student, error) one row at a time
+        reader = csv.DictReader(lines)
         
-        try:
-            csv_file = io.StringIO(file_content)
-            reader = csv.DictReader(csv_file)
+        # validate headers
+        expected_headers = {'full_name', 'grade'}
+        if not reader.fieldnames or not expected_headers.issubset(set(reader.fieldnames)):
+            yield 1, None, f"CSV must contain headers: {', '.join(expected_headers)}"
+            return
+        
+        line_number = 1
+        seen_keys = set()
+        
+        for row in reader:
+            line_number += 1
             
-            # validate headers
-            expected_headers = {'full_name', 'grade'}
-            if not expected_headers.issubset(set(reader.fieldnames)):
-                errors.append(f"CSV must contain headers: {', '.join(expected_headers)}")
-                return students, errors
+            name = (row.get('full_name') or '').strip()
+            if not name:
+                yield line_number, None, f"Line {line_number}: Missing student name"
+                continue
             
-            line_number = 1
-            seen_names = set()
+            # validate grade
+            grade = (row.get('grade') or '').strip()
+            grade_int = None
             
-            for row in reader:
-                line_number += 1
-                
-                name = row.get('full_name', '').strip()
-                if not name:
-                    errors.append(f"Line {line_number}: Missing student name")
-                    continue
-                
-                # check duplicates
-                if name.lower() in seen_names:
-                    errors.append(f"Line {line_number}: Duplicate student '{name}' in CSV")
-                    continue
-                
-                seen_names.add(name.lower())
-                
-                # validate grade
-                grade = row.get('grade', '').strip()
-                grade_int = None
-                
-                if grade:
-                    try:
-                        grade_int = int(grade)
-                        if grade_int < 1 or grade_int > 12:
-                            errors.append(f"Line {line_number}: Invalid grade '{grade}' for {name} (must be 1-12)")
-                            continue
-                    except ValueError:
-                        errors.append(f"Line {line_number}: Invalid grade '{grade}' for {name} (must be a number)")
+            if grade:
+                try:
+                    grade_int = int(grade)
+                    if grade_int < 1 or grade_int > 12:
+                        yield line_number, None, f"Line {line_number}: Invalid grade '{grade}' for {name} (must be 1-12)"
                         continue
-                
-                students.append({
-                    'full_name': name,
-                    'grade': grade_int,
-                    'email': row.get('email', '').strip() or None,
-                    'is_active': True
-                })
+                except ValueError:
+                    yield line_number, None, f"Line {line_number}: Invalid grade '{grade}' for {name} (must be a number)"
+                    continue
+            
+            # check duplicates, keyed the same way as the students unique index
+            key = (name.lower(), grade_int)
+            if key in seen_keys:
+                yield line_number, None, f"Line {line_number}: Duplicate student '{name}' in CSV"
+                continue
+            
+            seen_keys.add(key)
+            
+            yield line_number, {
+                'full_name': name,
+                'grade': grade_int,
+                'email': (row.get('email') or '').strip() or None,
+                'is_active': True
+            }, None
+    
+    @staticmethod
+    def parse_csv(file_content: str) -> Tuple[List[Dict], List[str]]:
+        students = []
+        errors = []
+        
+        try:
+            for _, student, error in CSVStudentImporter.iter_rows(io.StringIO(file_content)):
+                if error:
+                    errors.append(error)
+                else:
+                    students.append(student)
             
             return students, errors
             
@@ -65,22 +74,18 @@ class CSVStudentImporter:
             return students, errors
     
     @staticmethod
-    def validate_against_database(students: List[Dict], existing_students: List[Dict]) -> Tuple[List[Dict], List[str]]:
-        valid_students = []
+    def find_skipped(students: List[Dict], inserted: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        # rows sent to an on-conflict-do-nothing upsert that didn't come back
+        inserted_keys = {(s['full_name'], s.get('grade')) for s in inserted}
+        skipped = []
         warnings = []
         
-        existing_names = {s['full_name'].lower() for s in existing_students}
-        
         for student in students:
-            name_lower = student['full_name'].lower()
-            
-            if name_lower in existing_names:
+            if (student['full_name'], student.get('grade')) not in inserted_keys:
+                skipped.append(student)
                 warnings.append(f"Student '{student['full_name']}' already exists in database - skipping")
-            else:
-                valid_students.append(student)
-                existing_names.add(name_lower)
         
-        return valid_students, warnings
+        return skipped, warnings
     
     @staticmethod
     def generate_import_summary(total_rows: int, imported: int, skipped: int, errors: List[str]) -> Dict:
@@ -0,0 +1,58 @@
+# keyset pagination cursors and page sizes
+# cursor parts end up inside postgrest filter strings, so each one is parsed as
+# its expected type and re-serialized, never passed through as sent
+import re
+import uuid
+from datetime import date, datetime
+from typing import Tuple
+
+class InvalidCursor(ValueError):
+    # any malformed pagination argument, routes answer it with a 400
+    pass
+
+def _timestamp(value: str) -> str:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+
+def _date(value: str) -> str:
+    return date.fromisoformat(value).isoformat()
+
+def _uuid(value: str) -> str:
+    return str(uuid.UUID(value))
+
+def _int(value: str) -> str:
+    if not re.fullmatch(r'-?\d+', value):
+        raise ValueError(value)
+    return str(int(value))
+
+_PARSERS = {
+    'timestamp': _timestamp,
+    'date': _date,
+    'uuid': _uuid,
+    'int': _int
+}
+
+def parse_cursor(raw: str, *kinds: str) -> Tuple[str, ...]:
+    # parse_cursor('2024-01-01|<uuid>', 'date', 'uuid') -> ('2024-01-01', '<uuid>')
+    parts = raw.split('|')
+    if len(parts) != len(kinds):
+        raise InvalidCursor('Invalid cursor')
+    
+    try:
+        return tuple(_PARSERS[kind](part) for kind, part in zip(kinds, parts))
+    except ValueError:
+        raise InvalidCursor('Invalid cursor')
+
+def parse_timestamp(raw: str) -> str:
+    # a single timestamp query arg, validated the same way
+    try:
+        return _timestamp(raw)
+    except ValueError:
+        raise InvalidCursor('Invalid timestamp')
+
+def parse_limit(raw, default: int, maximum: int) -> int:
+    # a page size query arg: a positive integer, capped at maximum
+    if raw is None:
+        return default
+    if not re.fullmatch(r'\d+', raw) or int(raw) < 1:
+        raise InvalidCursor('Invalid limit')
+    return min(int(raw), maximum)
@@ -0,0 +1,48 @@
+# run independent queries concurrently on a shared, bounded thread pool
+# tasks run outside the request context, so they must not touch flask.request or flask.g
+# don't call fan_out from inside a task, the pool is bounded
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from config import Config
+
+_executor = ThreadPoolExecutor(max_workers=Config.FANOUT_MAX_WORKERS, thread_name_prefix='fanout')
+
+Task = Union[Callable[[], Any], Tuple[Callable[[], Any], float]]
+
+class FanOutResult:
+    
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+    
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+def fan_out(tasks: Dict[str, Task], timeout: Optional[float] = None) -> FanOutResult:
+    # tasks map a name to a callable, or to (callable, timeout in seconds)
+    default_timeout = Config.FANOUT_TIMEOUT if timeout is None else timeout
+    started = time.monotonic()
+    
+    futures = {}
+    for name, task in tasks.items():
+        fn, task_timeout = task if isinstance(task, tuple) else (task, default_timeout)
+        futures[name] = (_executor.submit(fn), task_timeout)
+    
+    outcome = FanOutResult()
+    for name, (future, task_timeout) in futures.items():
+        # every task started together, so each deadline counts from the start
+        remaining = max(0, started + task_timeout - time.monotonic())
+        try:
+            outcome.results[name] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            outcome.errors[name] = f'Timed out after {task_timeout}s'
+        except Exception as e:
+            outcome.errors[name] = str(e)
+    
+    return outcome
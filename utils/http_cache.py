@@ -0,0 +1,82 @@
+# response cache for public read endpoints
+# entries are keyed on the view arguments and the query args it actually reads,
+# plus the publish version they were built from
+import hashlib
+import threading
+from collections import defaultdict
+from functools import wraps
+from flask import request, make_response, current_app
+from config import Config
+from utils.ttl_cache import TTLCache
+
+class PublishVersions:
+    # per-week counters, plus an epoch that moves whenever any week does
+    
+    def __init__(self):
+        self._weeks = defaultdict(int)
+        self._epoch = 0
+        self._lock = threading.Lock()
+    
+    def bump(self, week_id):
+        with self._lock:
+            self._weeks[week_id] += 1
+            self._epoch += 1
+    
+    def week(self, week_id):
+        with self._lock:
+            return self._weeks.get(week_id, 0)
+    
+    def epoch(self):
+        with self._lock:
+            return self._epoch
+
+publish_versions = PublishVersions()
+
+# the ttl is a safety net for writes made by other workers
+# bounded, so old versions and junk query strings can't grow it without limit
+_response_cache = TTLCache(Config.PUBLIC_CACHE_TTL, max_entries=Config.PUBLIC_CACHE_MAX_ENTRIES)
+
+def bump_publish_version(week_id):
+    # call after anything that changes a week's public results
+    if week_id:
+        publish_versions.bump(week_id)
+
+def _finish(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={Config.PUBLIC_CACHE_MAX_AGE}, must-revalidate'
+    return response
+
+def cached_public_response(version_for, query_args=()):
+    # version_for gets the view kwargs and returns the version the data depends on
+    # query_args names the request.args the view reads; anything else is ignored
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(request.args.get(name) for name in query_args),
+                version_for(**kwargs)
+            )
+            entry = _response_cache.get(key)
+            
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                
+                # only cache good responses
+                if response.status_code != 200:
+                    return response
+                
+                body = response.get_data()
+                entry = (body, response.mimetype, hashlib.sha256(body).hexdigest())
+                _response_cache.set(key, entry)
+            
+            body, mimetype, etag = entry
+            
+            if request.if_none_match.contains(etag):
+                return _finish(current_app.response_class(status=304), etag)
+            
+            return _finish(current_app.response_class(body, mimetype=mimetype), etag)
+        
+        return decorated_function
+    return decorator
@@ -0,0 +1,91 @@
+# in-process index of judge permissions keyed by (user_email, week_id, judge_type)
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from supabase import create_client
+from config import Config
+
+supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+
+# permissions are embedded with their week so assignment lists need no extra query
+JUDGE_PERMISSION_SELECT = '*, weeks(id, week_number, topic, session_id, sessions(events(name)))'
+
+class JudgePermissionIndex:
+    
+    def __init__(self, loader: Callable[[str], List[Dict]], ttl: float):
+        self._loader = loader
+        self._ttl = ttl
+        self._permissions = {}
+        # email -> time its rows were loaded until
+        self._loaded_until = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(row: Dict):
+        return (row['user_email'], row['week_id'], row['judge_type'])
+    
+    def _ensure_loaded(self, email: str) -> None:
+        with self._lock:
+            if self._loaded_until.get(email, 0) > time.monotonic():
+                return
+        
+        # query outside the lock so other judges aren't blocked
+        rows = self._loader(email)
+        
+        with self._lock:
+            for key in [k for k in self._permissions if k[0] == email]:
+                del self._permissions[key]
+            for row in rows:
+                self._permissions[self._key(row)] = row
+            self._loaded_until[email] = time.monotonic() + self._ttl
+    
+    def get(self, email: str, week_id: str, judge_type: str) -> Optional[Dict]:
+        # active permission or None
+        self._ensure_loaded(email)
+        row = self._permissions.get((email, week_id, judge_type))
+        return row if row and row.get('is_active') else None
+    
+    def for_email(self, email: str, week_id: Optional[str] = None) -> List[Dict]:
+        self._ensure_loaded(email)
+        with self._lock:
+            return [
+                row for key, row in self._permissions.items()
+                if key[0] == email
+                and row.get('is_active')
+                and (week_id is None or key[1] == week_id)
+            ]
+    
+    def put(self, row: Dict) -> None:
+        # write-through after grant, revoke or reactivate
+        email = row['user_email']
+        
+        with self._lock:
+            # emails not loaded yet will read fresh rows anyway
+            if email not in self._loaded_until:
+                return
+            
+            key = self._key(row)
+            merged = {**self._permissions.get(key, {}), **row}
+            self._permissions[key] = merged
+            
+            # new grants come back without the week embed, reload on next read
+            if 'weeks' not in merged:
+                del self._loaded_until[email]
+    
+    def invalidate(self, email: Optional[str] = None) -> None:
+        with self._lock:
+            if email is None:
+                self._permissions.clear()
+                self._loaded_until.clear()
+            else:
+                self._loaded_until.pop(email, None)
+
+def _load_permissions(email: str) -> List[Dict]:
+    # revoked rows are kept so reactivation can update them in place
+    response = supabase.table('judge_permissions')\
+        .select(JUDGE_PERMISSION_SELECT)\
+        .eq('user_email', email)\
+        .execute()
+    return response.data
+
+judge_permission_index = JudgePermissionIndex(_load_permissions, Config.JUDGE_PERMISSION_CACHE_TTL)
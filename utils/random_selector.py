@@ -1,8 +1,11 @@
 import random
-from typing import List, Dict, Tuple, Optional
+import secrets
+from typing import List, Dict, Tuple, Optional, Union
 
 class ExtemporeRandomSelector:
     
+    # routes use the get_available_speakers database function instead
+    # this in-memory version is kept for callers that already hold the rows
     @staticmethod
     def get_available_students(
         all_students: List[Dict],
@@ -34,19 +37,162 @@ class ExtemporeRandomSelector:
         
         return available
     
+    @staticmethod
+    def new_seed() -> int:
+        # fits a BIGINT column and stays exact as a JSON number in the browser
+        return secrets.randbits(53)
+    
     @staticmethod
     def select_random_participants(
         available_students: List[Dict],
         count: int,
-        seed: Optional[int] = None
+        seed: Optional[Union[int, str]] = None
     ) -> List[Dict]:
-        if seed is not None:
-            random.seed(seed)
+        # own rng per call, the global one is shared with every other thread
+        rng = random.Random(seed)
         
         if len(available_students) <= count:
             return available_students.copy()
         
-        return random.sample(available_students, count)
+        # sort first so the same seed and candidates replay the same draw
+        candidates = sorted(available_students, key=lambda s: s['id'])
+        return rng.sample(candidates, count)
+    
+    @staticmethod
+    def select_batch(
+        draws: List[Dict],
+        seed: Optional[int] = None,
+        exclusive: bool = True
+    ) -> Tuple[int, Dict[str, List[Dict]]]:
+        # draws: [{'key', 'students', 'count'}], e.g. one per week or grade
+        # returns the seed used, so the whole batch can be replayed
+        seed = ExtemporeRandomSelector.new_seed() if seed is None else seed
+        picked_ids = set()
+        selections = {}
+        
+        for draw in draws:
+            candidates = draw['students']
+            if exclusive:
+                candidates = [s for s in candidates if s['id'] not in picked_ids]
+            
+            # each draw gets its own stream derived from the batch seed
+            selected = ExtemporeRandomSelector.select_random_participants(
+                candidates,
+                draw['count'],
+                seed=f"{seed}:{draw['key']}"
+            )
+            
+            picked_ids.update(s['id'] for s in selected)
+            selections[draw['key']] = selected
+        
+        return seed, selections
+    
+    @staticmethod
+    def parse_positive_int(value) -> Optional[int]:
+        # ints or digit strings above zero, anything else is None
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if isinstance(value, int) and value > 0:
+            return value
+        return None
+    
+    @staticmethod
+    def normalize_week_specs(week_specs) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        # week_number and count must be positive integers, grade_filter an integer or absent
+        # returns (specs, None) or (None, error)
+        if not isinstance(week_specs, list) or not week_specs:
+            return None, "weeks must be a non-empty list"
+        
+        normalized = []
+        for index, spec in enumerate(week_specs):
+            if not isinstance(spec, dict):
+                return None, f"Week {index} must be an object"
+            
+            week_number = ExtemporeRandomSelector.parse_positive_int(spec.get('week_number'))
+            count = ExtemporeRandomSelector.parse_positive_int(spec.get('count'))
+            if week_number is None:
+                return None, f"Week {index}: week_number must be a positive integer"
+            if count is None:
+                return None, f"Week {index}: count must be a positive integer"
+            
+            grade_filter = spec.get('grade_filter')
+            if grade_filter is not None:
+                try:
+                    grade_filter = int(grade_filter)
+                except (TypeError, ValueError):
+                    return None, f"Week {index}: grade_filter must be an integer"
+            
+            normalized.append({'week_number': week_number, 'count': count, 'grade_filter': grade_filter})
+        
+        if len({spec['week_number'] for spec in normalized}) != len(normalized):
+            return None, "Each week_number can only be planned once"
+        
+        return normalized, None
+    
+    @staticmethod
+    def plan_session_rotation(
+        students: List[Dict],
+        week_specs: List[Dict],
+        seed: Optional[int] = None
+    ) -> List[Dict]:
+        # whole-session schedule: everyone eligible speaks once before anyone repeats
+        # week_specs: [{'week_number', 'count', 'grade_filter'}] as returned by normalize_week_specs
+        # students may carry has_spoken, for a plan made partway through a cycle
+        # one rotation shared by every grade filter: each week takes the eligible
+        # students who have spoken least, so mixing filtered and all-grade weeks
+        # never repeats someone while another student is still waiting
+        rng = random.Random(seed)
+        
+        # per student: times spoken (students who already spoke this cycle start at
+        # one), index of the last week spoken, and a random tie-break that is
+        # redrawn on every turn (a fresh shuffle per cycle)
+        state = {
+            s['id']: {
+                'count': 1 if s.get('has_spoken') else 0,
+                'last': None,
+                'key': rng.random(),
+                'grade': s.get('grade')
+            }
+            for s in sorted(students, key=lambda s: s['id'])
+            if s.get('is_active', True)
+        }
+        slots = []
+        
+        for index, spec in enumerate(sorted(week_specs, key=lambda w: w['week_number'])):
+            grade_filter = spec.get('grade_filter')
+            eligible = [
+                student_id for student_id, st in state.items()
+                if grade_filter is None or st['grade'] == grade_filter
+            ]
+            
+            # whoever spoke last week goes behind the rest of their cycle, so a
+            # student who closed one cycle isn't straight back at the start of the next
+            eligible.sort(key=lambda i: (
+                state[i]['count'],
+                state[i]['last'] is not None and state[i]['last'] == index - 1,
+                state[i]['key']
+            ))
+            
+            count = min(spec['count'], len(eligible))
+            selected = eligible[:count]
+            
+            for student_id in selected:
+                st = state[student_id]
+                st['count'] += 1
+                st['last'] = index
+                st['key'] = rng.random()
+            
+            slots.append({
+                'week_number': spec['week_number'],
+                'student_ids': selected,
+                'grade_filter': grade_filter,
+                'cycle': max((state[i]['count'] for i in selected), default=0),
+                'is_partial': count < spec['count']
+            })
+        
+        return slots
     
     @staticmethod
     def check_availability(
@@ -0,0 +1,69 @@
+# one scoring path for admin results, public rankings and publishing
+# the ranking itself (totals, ties, winners) comes from the get_week_standings
+# database function, which publish_week_results also uses; this only adds the
+# per-judge-type breakdown and student details for display
+from typing import Dict, List
+from utils.fanout import fan_out
+
+JUDGE_TYPES = ['overall', 'content', 'style_delivery', 'language']
+
+class ScoreAggregator:
+    
+    @staticmethod
+    def aggregate(participants: List[Dict], scores: List[Dict], ranking: List[Dict]) -> List[Dict]:
+        # every score row counts, grouped by judge type
+        # so two judges of the same type add up instead of overwriting each other
+        by_participant = {}
+        for score in scores:
+            by_type = by_participant.setdefault(score['participant_id'], {})
+            judge_type = score.get('judge_type')
+            by_type[judge_type] = by_type.get(judge_type, 0) + (score.get('score') or 0)
+        
+        participants_by_id = {p['id']: p for p in participants}
+        
+        # ranking is already in standings order
+        standings = []
+        for ranked in ranking:
+            participant = participants_by_id.get(ranked['participant_id'])
+            if participant is None:
+                continue
+            by_type = by_participant.get(participant['id'], {})
+            student = participant.get('students') or {}
+            
+            standing = {
+                'participant_id': participant['id'],
+                'student_id': participant.get('student_id'),
+                'student_name': student.get('full_name') or student.get('name', 'Unknown'),
+                'roll_number': student.get('roll_number', 'N/A'),
+                'grade': student.get('grade', 'N/A'),
+                'position': participant.get('position'),
+                'is_winner': participant.get('is_winner', False),
+                'rank': ranked['rank'],
+                'total_score': round(float(ranked['total_score'] or 0), 2),
+                'scores_by_type': by_type
+            }
+            for judge_type in JUDGE_TYPES:
+                standing[f'{judge_type}_score'] = by_type.get(judge_type)
+            
+            standings.append(standing)
+        
+        return standings
+
+def load_week_standings(client, week_id: str) -> List[Dict]:
+    # participants, every score and the ranking for the week, fetched together
+    outcome = fan_out({
+        'participants': lambda: client.table('participants')\
+            .select('id, student_id, position, is_winner, students(*)')\
+            .eq('week_id', week_id)\
+            .execute().data,
+        'scores': lambda: client.table('judge_scores')\
+            .select('participant_id, judge_type, score, participants!inner(week_id)')\
+            .eq('participants.week_id', week_id)\
+            .execute().data,
+        'ranking': lambda: client.rpc('get_week_standings', {'p_week_id': week_id}).execute().data
+    })
+    
+    if not outcome.ok:
+        raise RuntimeError(f"Failed to load week scores: {outcome.errors}")
+    
+    return ScoreAggregator.aggregate(outcome.get('participants'), outcome.get('scores'), outcome.get('ranking'))